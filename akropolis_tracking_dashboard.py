@@ -6,45 +6,53 @@ Simple dashboard with links to all tracking applications
 
 import streamlit as st
 
-def main():
+# Dashboards to link to: (emoji, section title, dashboard name, link label, url).
+# The first one is shown full width, the rest side by side below it.
+_DASHBOARDS = (
+    ("📈", "Monthly Tracking", "Akropolis Monthly Tracking Dashboard", "Monthly Tracking Dashboard",
+     "https://akropolismonthlytrackingtest-8pmjx2uq4btcqbpbgucqhb.streamlit.app/"),
+    ("📱", "Weekly Ads", "Akropolis Weekly Ads Dashboard", "Weekly Ads Dashboard",
+     "https://akropolisweeklyadstest-erfnsca8fozjbyt6nrfimz.streamlit.app/"),
+    ("📊", "Weekly Social Media", "Akropolis Weekly Social Media Dashboard", "Social Media Dashboard",
+     "https://akropolisweeklysocialmediatest-twcfzbwexd5l7vcfbh4jpf.streamlit.app/"),
+)
+
+_FOOTER_MD = "*Select any of the above links to access the respective tracking dashboard.*"
+
+def render_dashboard_link(emoji, section, name, label, url):
+    """Render one dashboard section: header, name and link"""
+    st.header(f"{emoji} {section}")
+    st.markdown(f"**{name}**\n\n[🔗 Open {label}]({url})")
+
+@st.fragment
+def render_links():
+    """Render the dashboard links (fragment: reruns independently of the page)"""
+    st.title("📊 Akropolis Tracking Dashboard")
+    st.markdown("---")
+
+    featured, *others = _DASHBOARDS
+    render_dashboard_link(*featured)
+
+    st.markdown("---")
+
+    for col, dashboard in zip(st.columns(len(others)), others):
+        with col:
+            render_dashboard_link(*dashboard)
+
+    st.markdown("---")
+    st.markdown(_FOOTER_MD)
+
+# Page config only needs to be sent once per browser session, not on every rerun
+if "_page_configured" not in st.session_state:
     st.set_page_config(
         page_title="Akropolis Tracking Dashboard",
         page_icon="📊",
         layout="wide"
     )
-    
-    st.title("📊 Akropolis Tracking Dashboard")
-    st.markdown("---")
-    
-    st.header("📈 Monthly Tracking")
-    st.markdown("""
-    **Akropolis Monthly Tracking Dashboard**
-    
-    [🔗 Open Monthly Tracking Dashboard](https://akropolismonthlytrackingtest-8pmjx2uq4btcqbpbgucqhb.streamlit.app/)
-    """)
-    
-    st.markdown("---")
-    
-    col1, col2 = st.columns(2)
-    
-    with col1:
-        st.header("📱 Weekly Ads")
-        st.markdown("""
-        **Akropolis Weekly Ads Dashboard**
-        
-        [🔗 Open Weekly Ads Dashboard](https://akropolisweeklyadstest-erfnsca8fozjbyt6nrfimz.streamlit.app/)
-        """)
-    
-    with col2:
-        st.header("📊 Weekly Social Media")
-        st.markdown("""
-        **Akropolis Weekly Social Media Dashboard**
-        
-        [🔗 Open Social Media Dashboard](https://akropolisweeklysocialmediatest-twcfzbwexd5l7vcfbh4jpf.streamlit.app/)
-        """)
-    
-    st.markdown("---")
-    st.markdown("*Select any of the above links to access the respective tracking dashboard.*")
+    st.session_state["_page_configured"] = True
+
+def main():
+    render_links()
 
 if __name__ == "__main__":
     main()
@@ -1,40 +1,84 @@
 # === Configuration ===
 import os
-from datetime import datetime
+import functools
+from datetime import date
 
 # === DATE CONFIGURATION ===
 # Define the analysis period for the dashboard and summaries
-ANALYSIS_START_DATE = datetime(2025, 9, 23).date()  # September 5, 2025
-ANALYSIS_END_DATE = datetime(2025, 10, 7).date()   # September 18, 2025
+ANALYSIS_START_DATE = date(2025, 9, 23)  # September 23, 2025
+ANALYSIS_END_DATE = date(2025, 10, 7)    # October 7, 2025
+
+if ANALYSIS_END_DATE <= ANALYSIS_START_DATE:
+    raise ValueError(
+        f"ANALYSIS_END_DATE ({ANALYSIS_END_DATE}) must be after ANALYSIS_START_DATE ({ANALYSIS_START_DATE})"
+    )
 
 # === DEPLOYMENT CONFIGURATION ===
-# Set to True when deploying to Streamlit Cloud, False for local development
-STREAMLIT_HOSTING = False  # Change to True for Streamlit Cloud deployment
+# Detected automatically: Streamlit Cloud checks the app out under /mount/src
+# (set STREAMLIT_CLOUD=1 to force the hosted configuration elsewhere)
+STREAMLIT_HOSTING = bool(os.environ.get("STREAMLIT_CLOUD")) or os.path.exists("/mount/src")
 
 # Load environment variables based on deployment type
-if STREAMLIT_HOSTING:
-    # Streamlit Cloud - uses secrets management
-    BRIGHTDATA_API_TOKEN = os.getenv("BRIGHTDATA_API_TOKEN")
-    OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-else:
-    # Local development - uses .env file
-    from dotenv import load_dotenv
-    load_dotenv()
-    BRIGHTDATA_API_TOKEN = os.getenv("BRIGHTDATA_API_TOKEN")
-    OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+_LAZY_ENV_VARS = ("BRIGHTDATA_API_TOKEN", "OPENAI_API_KEY", "BRIGHTDATA_NOTIFY_URL")
+
+def _parse_env(path=".env"):
+    """Minimal .env reader: KEY=VALUE lines, optional 'export' prefix and quotes"""
+    values = {}
+    try:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line or line.startswith("#") or "=" not in line:
+                    continue
+                key, value = line.split("=", 1)
+                key = key.removeprefix("export ").strip()
+                value = value.strip()
+                if len(value) >= 2 and value[0] == value[-1] and value[0] in "'\"":
+                    value = value[1:-1]
+                values[key] = value
+    except FileNotFoundError:
+        pass
+    return values
+
+@functools.lru_cache(maxsize=1)
+def _bootstrap_env():
+    """Read the API tokens (and notify URL) once per process (Streamlit reruns re-import config)"""
+    if not STREAMLIT_HOSTING:
+        # Local development - uses .env file (real environment variables win)
+        for key, value in _parse_env().items():
+            if key in _LAZY_ENV_VARS:
+                os.environ.setdefault(key, value)
+    # Streamlit Cloud - uses secrets management (already in the environment)
+    return {key: os.getenv(key) for key in _LAZY_ENV_VARS}
+
+def __getattr__(name):
+    """Resolve BRIGHTDATA_API_TOKEN / OPENAI_API_KEY / BRIGHTDATA_NOTIFY_URL lazily on first access (PEP 562)"""
+    if name in _LAZY_ENV_VARS:
+        return _bootstrap_env()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 TIMEZONE = "Europe/Vilnius"
-DAYS_BACK = 14            # today + yesterday
+DAYS_BACK = (ANALYSIS_END_DATE - ANALYSIS_START_DATE).days  # length of the analysis period
 MAX_POSTS = 30           # maximum posts per company
-MAX_WORKERS = 1           # number of parallel scraping threads
+MAX_WORKERS = 5           # number of parallel scraping threads
+SCRAPE_BATCH_SIZE = 10    # URLs per Bright Data snapshot; batches are scraped in parallel
 MAX_WAIT_MINUTES = 30     # maximum wait time for Bright Data snapshots
+POLL_INITIAL_SEC = 2      # first delay between snapshot status checks
+POLL_MAX_SEC = 30         # upper bound for the delay between status checks
+POLL_BACKOFF = 1.5        # delay multiplier applied after every check
 
 # === BRIGHT DATA CONFIGURATION ===
 BRIGHTDATA_DATASET_IDS = {
     "facebook": "gd_lkaxegm826bjpoo9m5"
 }
+# BRIGHTDATA_NOTIFY_URL (optional, from the environment like the token): URL
+# Bright Data calls when a snapshot is ready (trigger "notify" parameter);
+# the scraper still polls the progress endpoint either way
 
 # === PATH CONFIGURATION ===
+# Parquet files are the canonical data files (generated, not committed). The
+# .xlsx paths are their Excel exports, which are the committed copies: a
+# Parquet file is (re)built from its .xlsx when missing or older than it.
 if STREAMLIT_HOSTING:
     # Streamlit Cloud - direct repository root deployment
     FACEBOOK_MASTER_XLSX = "./data/facebook_master_file.xlsx"
@@ -47,22 +91,52 @@ else:
 # Primary master file - now points to Facebook
 MASTER_XLSX = FACEBOOK_MASTER_XLSX
 
+# Canonical data files: read and written by the pipeline, dashboard and summaries
+FACEBOOK_MASTER_PARQUET = "./data/facebook_master_file.parquet"
+SUMMARIES_PARQUET = "./data/summaries.parquet"
+MASTER_PARQUET = FACEBOOK_MASTER_PARQUET
+
+# Also write the .xlsx export next to each Parquet file on every save. Keep it
+# on so the committed .xlsx files track the data; turning it off speeds up
+# saves (openpyxl dominates save time) but leaves the .xlsx files stale
+EXPORT_XLSX = True
+
+# Other Excel inputs (scraped exports) are parsed once per file content and
+# cached as Parquet here; pass --no-cache on the command line to bypass it
+EXCEL_CACHE_DIR = "./data/.cache"
+USE_EXCEL_CACHE = True
+
+# Brand summaries are cached by a hash of their prompt, so re-running the
+# summaries on unchanged data doesn't call the API again (--no-cache skips it)
+SUMMARY_CACHE_DIR = "./data/.cache/summaries"
+USE_SUMMARY_CACHE = True
+
 # === DATA PROCESSING CONFIGURATION ===
 # Note: July 1-14 labeled data has been integrated into the main master files
 
 # === FILE STRUCTURE NOTES ===
 # The system now uses Facebook master file:
-# - facebook_master_file.xlsx: All Facebook posts with complete column structure + GPT labels
+# - facebook_master_file.parquet: All Facebook posts with complete column structure + GPT labels
+#   (facebook_master_file.xlsx: Excel export of the same data)
 # Note: GPT-generated summaries and clusters are integrated into the main master files
 # Note: MASTER_XLSX now points to Facebook master file
 
 # === GPT Labeling Configuration ===
-GPT_MAX_WORKERS = 20    # number of parallel GPT API calls
+GPT_TPM_LIMIT = 90_000          # OpenAI tokens-per-minute limit of the account
+GPT_RPM_LIMIT = 500             # OpenAI requests-per-minute limit of the account
+GPT_MAX_WORKERS = 100           # concurrent GPT API calls; labeling and summaries are throttled to the TPM/RPM limits
+GPT_MAX_RETRIES = 6             # retries of a GPT call on 429/5xx/connection errors (backoff honors Retry-After)
 ENABLE_GPT_LABELING = True  # Set to False to skip GPT labeling
+USE_BATCH_API = False  # Label via the OpenAI Batch API (50% cheaper, results within 24h) for unattended runs
+GPT_BATCH_MAX_WAIT_HOURS = 24  # give up on a Batch API job after its completion window
+GPT_LABEL_CACHE_PARQUET = "./data/gpt_label_cache.parquet"  # labels keyed by content hash; None disables the cache
+GPT_LABEL_CHECKPOINT_JSONL = "./data/gpt_label_checkpoint.jsonl"  # labels appended per finished batch, folded into the cache
+MIN_CONTENT_CHARS = 20  # shorter posts (greetings, one-liners) are not sent to GPT and are labeled OTHER
+MIN_ENGAGEMENT_FOR_LABEL = 0  # posts below this total_engagement are not sent to GPT (0 labels everything)
 ENABLE_WEEKLY_SUMMARIES = True  # Set to False to skip weekly summary generation
 
 # === SOCIAL MEDIA URLS ===
-FACEBOOK_URLS = [
+FACEBOOK_URLS = (
     "https://www.facebook.com/ozas.lt/",
     "https://www.facebook.com/panorama.lt/",
     "https://www.facebook.com/akropolis.vilnius/",
@@ -82,33 +156,61 @@ FACEBOOK_URLS = [
     "https://www.facebook.com/MAXIMALT/",
     "https://www.facebook.com/lidllietuva/?locale=lt_LT",
     "https://www.facebook.com/RimiLietuva/",
-    "https://www.facebook.com/PrekybosTinklasIKI/"
-]
+    "https://www.facebook.com/PrekybosTinklasIKI/",
+)
+
+# Page slug -> brand name as it appears in the data (page_name)
+SLUG_TO_BRAND = {
+    "ozas.lt": "OZAS",
+    "panorama.lt": "PANORAMA",
+    "akropolis.vilnius": "AKROPOLIS | Vilnius",
+    "kaunoakropolis": "Kauno Akropolis",
+    "akropolis.klaipeda": "AKROPOLIS | Klaipėda",
+    "akropolis.siauliai": "AKROPOLIS | Šiauliai",
+    "vilniusoutlet": "Vilnius Outlet",
+    "outletparklietuva": "Outlet Park",
+    "CUPprekyboscentras": "CUP prekybos centras",
+    "nordika.lt": "NØRDIKA prekybos slėnis",
+    "bigvilnius": "BIG Vilnius",
+    "pceuropa.lt": "PC Europa",
+    "G9shoppingcenter": "G9",
+    "saulesmiestas": "SAULĖS MIESTAS",
+    "MOLAS.Klaipeda": "MOLAS Klaipėda",
+    "Mega.lt": "PLC Mega",
+    "MAXIMALT": "Maxima LT",
+    "lidllietuva": "Lidl Lietuva",
+    "RimiLietuva": "Rimi Lietuva",
+    "PrekybosTinklasIKI": "IKI",
+}
 
 # Combine all URLs for processing (Facebook only)
 ALL_URLS = FACEBOOK_URLS
 
 # === BRAND GROUPINGS FOR ANALYSIS ===
-AKROPOLIS_LOCATIONS = [
+AKROPOLIS_LOCATIONS = (
     "AKROPOLIS | Vilnius",
     "AKROPOLIS | Klaipėda", 
     "AKROPOLIS | Šiauliai",
-]
+)
 
-BIG_PLAYERS = ["PANORAMA", "OZAS", "Kauno Akropolis"]
-SMALLER_PLAYERS = [
+BIG_PLAYERS = ("PANORAMA", "OZAS", "Kauno Akropolis")
+SMALLER_PLAYERS = (
     "Vilnius Outlet",
     "BIG Vilnius",
     "Outlet Park",
     "CUP prekybos centras",
     "PC Europa",
     "G9",
-]
-OTHER_CITIES = [
+)
+OTHER_CITIES = (
     "SAULĖS MIESTAS",
     "PLC Mega",     # covers Kaunas Mega
-]
-RETAIL = ["Maxima LT", "Lidl Lietuva", "Rimi Lietuva", "IKI"]
+)
+RETAIL = ("Maxima LT", "Lidl Lietuva", "Rimi Lietuva", "IKI")
+
+# Every tracked brand, in display order (used as the pandas Categorical categories)
+ALL_BRANDS = AKROPOLIS_LOCATIONS + BIG_PLAYERS + SMALLER_PLAYERS + OTHER_CITIES + RETAIL
+ALL_BRANDS_SET = frozenset(ALL_BRANDS)
 
 SUBSETS_CORE = {
     "Big players": BIG_PLAYERS,
@@ -120,7 +222,14 @@ SUBSETS_WITH_RETAIL = {
     "Retail": RETAIL,
 }
 
+# Frozen variant for O(1) membership tests / pandas isin filters
+SUBSETS_WITH_RETAIL_SETS = {name: frozenset(members) for name, members in SUBSETS_WITH_RETAIL.items()}
+
 # Columns to uniquely identify a social media post
 DEDUP_KEYS = [
     "post_id"
 ]
+
+# Compare the key columns directly instead of by their 64-bit row hash when
+# deduplicating (slower; rules out hash collisions)
+DEDUP_EXACT = False
@@ -9,7 +9,9 @@ import pandas as pd
 import altair as alt
 from datetime import datetime, timedelta
 import numpy as np
+from pathlib import Path
 import config
+from storage import load_master_data, master_data_mtime, ENGAGEMENT_COLUMNS
 
 st.set_page_config(page_title=f"Facebook Social Media Intelligence – {config.ANALYSIS_START_DATE.strftime('%B %d')}-{config.ANALYSIS_END_DATE.strftime('%d, %Y')}", layout="wide")
 
@@ -29,55 +31,77 @@ SUBSETS_WITH_RETAIL = {
     **SUBSETS_CORE,
     "Retail": RETAIL,
 }
+SUBSETS_WITH_RETAIL_SETS = config.SUBSETS_WITH_RETAIL_SETS
 
 # ---- Load data from master files ----
-FACEBOOK_FILE_PATH = config.FACEBOOK_MASTER_XLSX
+FACEBOOK_FILE_PATH = config.FACEBOOK_MASTER_PARQUET
+
+# Only the columns the dashboard actually uses are read from the master file
+MASTER_COLUMNS = [
+    "post_id", "created_date", "brand", "platform", "content", "source_url",
+    "likes", "comments", "shares", "post_summary", "cluster_1",
+]
 
 @st.cache_data(show_spinner=False)
 def get_available_periods():
     """Get available 14-day periods from summaries file"""
     try:
-        summaries_df = pd.read_excel(config.SUMMARIES_XLSX)
+        summaries_df = load_master_data(Path(config.SUMMARIES_PARQUET))
         if summaries_df.empty:
             return []
         
-        periods = []
-        for i, row in summaries_df.iterrows():
-            start_date = pd.to_datetime(row['start_date']).date()
-            end_date = pd.to_datetime(row['end_date']).date()
-            period_label = f"{start_date.strftime('%B %d')} - {end_date.strftime('%B %d, %Y')}"
-            periods.append({
-                'index': i,
-                'label': period_label,
-                'start_date': start_date,
-                'end_date': end_date
-            })
+        starts = pd.to_datetime(summaries_df['start_date'])
+        ends = pd.to_datetime(summaries_df['end_date'])
+        labels = starts.dt.strftime('%B %d') + " - " + ends.dt.strftime('%B %d, %Y')
         
-        return periods
+        return [
+            {'index': i, 'label': label, 'start_date': start_date, 'end_date': end_date}
+            for i, label, start_date, end_date in zip(summaries_df.index, labels, starts.dt.date, ends.dt.date)
+        ]
     except Exception as e:
         st.error(f"Error loading available periods: {e}")
         return []
 
-@st.cache_data(show_spinner=False)
-def load_data(custom_start_date=None, custom_end_date=None):
-    """Load and process data from Facebook master file"""
-    # Load Facebook data
-    facebook_df = pd.read_excel(FACEBOOK_FILE_PATH)
-    facebook_df['platform'] = 'facebook'  # Ensure platform is set
-    
-    # Use Facebook data as the main dataset
-    df = facebook_df
+@st.cache_data(ttl=3600, show_spinner=False)
+def load_master(path: str, mtime: float) -> pd.DataFrame:
+    """Read and prepare the Facebook master file once; mtime is part of the cache key so a rewritten file is re-read"""
+    df = load_master_data(Path(path), columns=MASTER_COLUMNS)
+    df['platform'] = 'facebook'  # Ensure platform is set
     
     # Parse dates
     df["date"] = pd.to_datetime(df["created_date"], errors="coerce")
     
-    # Convert engagement metrics to numeric
-    df["likes"] = pd.to_numeric(df["likes"], errors="coerce").fillna(0)
-    df["comments"] = pd.to_numeric(df["comments"], errors="coerce").fillna(0)
-    df["shares"] = pd.to_numeric(df["shares"], errors="coerce").fillna(0)
+    # Convert engagement metrics to compact ints (signed, so week-over-week deltas can go negative).
+    # The master is stored with int64 metrics, so this is normally one cast; text/float
+    # columns (a master written before that) are coerced first
+    untyped = [col for col in ENGAGEMENT_COLUMNS if not pd.api.types.is_integer_dtype(df[col])]
+    for col in untyped:
+        df[col] = pd.to_numeric(df[col], errors="coerce").fillna(0)
+    df = df.astype({col: "int32" for col in ENGAGEMENT_COLUMNS})
     
     # Calculate weighted engagement: like=1, comment=3, share=5
-    df["total_engagement"] = (df["likes"] * 1 + df["comments"] * 3 + df["shares"] * 5)
+    # (single eval expression: one pass over the arrays, numexpr-backed when installed)
+    df["total_engagement"] = df.eval("likes + 3 * comments + 5 * shares").astype("int32")
+    
+    # Low-cardinality text columns as categoricals
+    df["platform"] = df["platform"].astype("category")
+    df["cluster_1"] = df["cluster_1"].astype("category")
+    
+    # Store brand as a categorical (int codes); brands seen in the data but not
+    # listed in config are appended so they are kept
+    extra_brands = sorted(set(df["brand"].dropna().unique()) - config.ALL_BRANDS_SET)
+    df["brand"] = pd.Categorical(df["brand"], categories=[*config.ALL_BRANDS, *extra_brands])
+    
+    # Posts without a parseable date never fall into a period; sort the rest by
+    # date so every period is a contiguous slice (the index keeps the file order)
+    return df[df["date"].notna()].sort_values("date", kind="stable")
+
+def load_data(custom_start_date=None, custom_end_date=None, master_mtime=None):
+    """Slice the cached master data into the 14-day, current-week and previous-week periods"""
+    # master_mtime keys the master cache to the current file version
+    if master_mtime is None:
+        master_mtime = master_data_mtime(FACEBOOK_FILE_PATH)
+    df = load_master(FACEBOOK_FILE_PATH, master_mtime)
     
     # Use custom date ranges if provided, otherwise use config defaults
     if custom_start_date and custom_end_date:
@@ -98,68 +122,59 @@ def load_data(custom_start_date=None, custom_end_date=None):
     prev_7_days_end = current_7_days_start - timedelta(days=1)
     prev_7_days_start = prev_7_days_end - timedelta(days=6)  # 7 days total
     
-    # Filter for last 14 days (for charts)
-    df_14_days = df[
-        (df["date"].dt.date >= last_14_days_start) & 
-        (df["date"].dt.date <= last_14_days_end)
-    ].copy()
+    # Each whole-day window is a contiguous slice of the date-sorted data, found
+    # with two binary searches; rows inside a window are put back in file order
+    sorted_dates = df["date"].to_numpy()
+    
+    def window(first_day, last_day):
+        start_ts = pd.Timestamp(first_day)
+        end_ts = pd.Timestamp(last_day) + pd.Timedelta(days=1)
+        lo, hi = np.searchsorted(sorted_dates, [start_ts.to_datetime64(), end_ts.to_datetime64()])
+        return df.iloc[lo:hi].sort_index()
+    
+    # Last 14 days (for charts)
+    df_14_days = window(last_14_days_start, last_14_days_end)
     
-    # Filter for current 7 days (for comparison stats)
-    df_current = df[
-        (df["date"].dt.date >= current_7_days_start) & 
-        (df["date"].dt.date <= current_7_days_end)
-    ].copy()
+    # Current 7 days (for comparison stats)
+    df_current = window(current_7_days_start, current_7_days_end)
     
-    # Filter for previous 7 days (for comparison stats)
-    df_previous = df[
-        (df["date"].dt.date >= prev_7_days_start) & 
-        (df["date"].dt.date <= prev_7_days_end)
-    ].copy()
+    # Previous 7 days (for comparison stats)
+    df_previous = window(prev_7_days_start, prev_7_days_end)
     
     return df_14_days, df_current, df_previous, last_14_days_start, last_14_days_end
 
-def calculate_comparison_stats(current_df, previous_df, akropolis_brands):
-    """Calculate comparison statistics between current and previous week"""
-    # Current week stats for Akropolis brands
-    current_akropolis = current_df[current_df["brand"].isin(akropolis_brands)]
-    current_posts = current_akropolis["post_id"].nunique()
-    current_engagement = current_akropolis["total_engagement"].sum()
-    current_likes = current_akropolis["likes"].sum()
-    current_comments = current_akropolis["comments"].sum()
-    current_shares = current_akropolis["shares"].sum()
-    
-    # Previous week stats for Akropolis brands
-    previous_akropolis = previous_df[previous_df["brand"].isin(akropolis_brands)]
-    previous_posts = previous_akropolis["post_id"].nunique()
-    previous_engagement = previous_akropolis["total_engagement"].sum()
-    previous_likes = previous_akropolis["likes"].sum()
-    previous_comments = previous_akropolis["comments"].sum()
-    previous_shares = previous_akropolis["shares"].sum()
-    
-    # Calculate percentage changes
-    posts_change = ((current_posts - previous_posts) / previous_posts * 100) if previous_posts > 0 else 0
-    engagement_change = ((current_engagement - previous_engagement) / previous_engagement * 100) if previous_engagement > 0 else 0
-    likes_change = ((current_likes - previous_likes) / previous_likes * 100) if previous_likes > 0 else 0
-    comments_change = ((current_comments - previous_comments) / previous_comments * 100) if previous_comments > 0 else 0
-    shares_change = ((current_shares - previous_shares) / previous_shares * 100) if previous_shares > 0 else 0
-    
-    return {
-        "current_posts": current_posts,
-        "current_engagement": current_engagement,
-        "current_likes": current_likes,
-        "current_comments": current_comments,
-        "current_shares": current_shares,
-        "previous_posts": previous_posts,
-        "previous_engagement": previous_engagement,
-        "previous_likes": previous_likes,
-        "previous_comments": previous_comments,
-        "previous_shares": previous_shares,
-        "posts_change": posts_change,
-        "engagement_change": engagement_change,
-        "likes_change": likes_change,
-        "comments_change": comments_change,
-        "shares_change": shares_change
-    }
+def brand_mask(df, brands):
+    """Rows whose brand is in brands, compared on the categorical integer codes"""
+    codes = df["brand"].cat.categories.get_indexer(list(brands))
+    return np.isin(df["brand"].cat.codes.to_numpy(), codes[codes >= 0])
+
+WEEK_METRICS = ["posts", "engagement", "likes", "comments", "shares"]
+
+def weekly_brand_totals(df):
+    """Posts, engagement, likes, comments and shares per brand for one week (single groupby)"""
+    return df.groupby("brand", observed=True).agg(
+        posts=("post_id", "nunique"),
+        engagement=("total_engagement", "sum"),
+        likes=("likes", "sum"),
+        comments=("comments", "sum"),
+        shares=("shares", "sum"),
+    )
+
+def pct_change_vs_previous(current, previous):
+    """Vectorized % change; 100% when growing from 0, 0% when both weeks are 0"""
+    current = current.to_numpy(dtype=float)
+    previous = previous.to_numpy(dtype=float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(previous > 0, (current - previous) / previous * 100, np.where(current > 0, 100.0, 0.0))
+
+def calculate_brand_comparison_stats(current_df, previous_df, brands):
+    """Current vs previous week totals and % changes for every brand, keyed by brand"""
+    current = weekly_brand_totals(current_df).reindex(brands, fill_value=0)
+    previous = weekly_brand_totals(previous_df).reindex(brands, fill_value=0)
+    stats = current.add_prefix("current_").join(previous.add_prefix("previous_"))
+    for metric in WEEK_METRICS:
+        stats[f"{metric}_change"] = pct_change_vs_previous(current[metric], previous[metric])
+    return stats.to_dict("index")
 
 def get_color_for_change(change):
     """Get color based on percentage change"""
@@ -170,54 +185,42 @@ def get_color_for_change(change):
     else:
         return "black"
 
-def create_post_card(brand, engagement, content, post_id, platform, source_url=None):
-    """Create a card-style display for a social media post with clickable link"""
-    truncated_content = content[:100] + "..." if len(content) > 100 else content
-    
-    # Create clickable link if source_url is available
-    link_html = ""
-    if source_url and pd.notna(source_url) and source_url != "":
-        link_html = f'<p style="margin: 5px 0;"><a href="{source_url}" target="_blank" style="color: #007bff; text-decoration: none; font-size: 12px;">🔗 View Original Post</a></p>'
-    
-    return f"""
+# ---- HTML card templates (filled with str.format_map) ----
+POST_CARD_TEMPLATE = """
     <div style="border: 1px solid #ddd; border-radius: 8px; padding: 15px; margin: 10px 0; background-color: #f9f9f9;">
         <div style="display: flex; justify-content: space-between; align-items: center;">
             <div>
-                <h4 style="margin: 0; color: #333;">{brand} ({platform.upper()})</h4>
-                <p style="margin: 5px 0; color: #666; font-size: 14px;">{truncated_content}</p>
+                <h4 style="margin: 0; color: #333;">{brand} ({platform})</h4>
+                <p style="margin: 5px 0; color: #666; font-size: 14px;">{content}</p>
                 {link_html}
             </div>
             <div style="text-align: right;">
-                <h3 style="margin: 0; color: #2E8B57;">{int(engagement):,}</h3>
+                <h3 style="margin: 0; color: #2E8B57;">{engagement:,}</h3>
                 <p style="margin: 0; color: #666; font-size: 12px;">engagement</p>
             </div>
         </div>
     </div>
     """
 
-def create_cluster_card_with_examples(cluster_name, posts_count, total_engagement, examples):
-    """Create a card-style display for a cluster with examples"""
-    examples_html = ""
-    if not examples.empty:
-        examples_html = "<div style='margin-top: 10px; padding-top: 10px; border-top: 1px solid #eee;'>"
-        examples_html += "<p style='margin: 0 0 5px 0; color: #888; font-size: 12px; font-weight: bold;'>Examples:</p>"
-        
-        for idx, row in examples.iterrows():
-            summary = str(row["post_summary"])
-            source_url = row["source_url"] if pd.notna(row["source_url"]) else None
-            
-            # Truncate long summaries
-            truncated_summary = summary[:150] + "..." if len(summary) > 150 else summary
-            
-            # Create clickable link if source_url is available
-            if source_url and source_url != "":
-                examples_html += f'<p style="margin: 2px 0; color: #666; font-size: 12px; font-style: italic;">• {truncated_summary} <a href="{source_url}" target="_blank" style="color: #007bff; text-decoration: none; font-size: 11px; margin-left: 5px;">🔗 View Post</a></p>'
-            else:
-                examples_html += f'<p style="margin: 2px 0; color: #666; font-size: 12px; font-style: italic;">• {truncated_summary}</p>'
-        
-        examples_html += "</div>"
-    
-    return f"""
+COMPARISON_ROW_TEMPLATE = """
+    <div style="display: flex; gap: 1rem;">
+        {cards}
+    </div>
+    """
+
+COMPARISON_CARD_TEMPLATE = """
+        <div style="flex: 1; border: 2px solid black; padding: 20px; border-radius: 10px; margin: 10px 0;">
+            <h3 style="color: {color}; margin: 0;">{title}: {current}</h3>
+            <p style="color: {color}; font-size: 18px; margin: 5px 0;">
+                {change:+.1f}% vs previous week
+            </p>
+            <p style="color: gray; font-size: 14px; margin: 0;">Previous week: {previous}</p>
+        </div>
+"""
+
+POST_LINK_TEMPLATE = '<p style="margin: 5px 0;"><a href="{url}" target="_blank" style="color: #007bff; text-decoration: none; font-size: 12px;">🔗 View Original Post</a></p>'
+
+CLUSTER_CARD_TEMPLATE = """
     <div style="border: 1px solid #ddd; border-radius: 8px; padding: 15px; margin: 10px 0; background-color: #f9f9f9;">
         <div style="display: flex; justify-content: space-between; align-items: flex-start;">
             <div style="flex: 1;">
@@ -226,13 +229,173 @@ def create_cluster_card_with_examples(cluster_name, posts_count, total_engagemen
                 {examples_html}
             </div>
             <div style="text-align: right; margin-left: 15px;">
-                <h3 style="margin: 0; color: #2E8B57;">{int(total_engagement):,}</h3>
+                <h3 style="margin: 0; color: #2E8B57;">{engagement:,}</h3>
                 <p style="margin: 0; color: #666; font-size: 12px;">engagement</p>
             </div>
         </div>
     </div>
     """
 
+EXAMPLES_HEADER_HTML = (
+    "<div style='margin-top: 10px; padding-top: 10px; border-top: 1px solid #eee;'>"
+    "<p style='margin: 0 0 5px 0; color: #888; font-size: 12px; font-weight: bold;'>Examples:</p>"
+)
+
+EXAMPLE_TEMPLATE = '<p style="margin: 2px 0; color: #666; font-size: 12px; font-style: italic;">• {summary}{link_html}</p>'
+
+EXAMPLE_LINK_TEMPLATE = ' <a href="{url}" target="_blank" style="color: #007bff; text-decoration: none; font-size: 11px; margin-left: 5px;">🔗 View Post</a>'
+
+def create_post_card(brand, engagement, content, post_id, platform, source_url=None):
+    """Create a card-style display for a social media post with clickable link"""
+    truncated_content = content[:100] + "..." if len(content) > 100 else content
+    
+    # Create clickable link if source_url is available (NaN/None are not str)
+    link_html = POST_LINK_TEMPLATE.format_map({"url": source_url}) if isinstance(source_url, str) and source_url else ""
+    
+    return POST_CARD_TEMPLATE.format_map({
+        "brand": brand,
+        "platform": platform.upper(),
+        "content": truncated_content,
+        "link_html": link_html,
+        "engagement": int(engagement),
+    })
+
+def create_cluster_card_with_examples(cluster_name, posts_count, total_engagement, examples):
+    """Create a card-style display for a cluster with examples (post_summary already truncated)"""
+    examples_html = ""
+    if not examples.empty:
+        example_rows = []
+        for row in examples.itertuples(index=False):
+            source_url = row.source_url
+            
+            # Create clickable link if source_url is available
+            link_html = EXAMPLE_LINK_TEMPLATE.format_map({"url": source_url}) if isinstance(source_url, str) and source_url else ""
+            example_rows.append(EXAMPLE_TEMPLATE.format_map({"summary": row.post_summary, "link_html": link_html}))
+        
+        examples_html = EXAMPLES_HEADER_HTML + "".join(example_rows) + "</div>"
+    
+    return CLUSTER_CARD_TEMPLATE.format_map({
+        "cluster_name": cluster_name,
+        "posts_count": posts_count,
+        "examples_html": examples_html,
+        "engagement": int(total_engagement),
+    })
+
+def render_cards(cards):
+    """Render a list of HTML cards with a single st.markdown call"""
+    st.markdown("".join(cards), unsafe_allow_html=True)
+
+NO_EXAMPLES = pd.DataFrame(columns=["post_summary", "source_url"])
+
+def get_cluster_brand_totals(df):
+    """Posts and engagement per (cluster, brand) - one groupby per week"""
+    return df.groupby(["cluster_1", "brand"], observed=True).agg(
+        posts_count=("post_id", "nunique"),
+        total_engagement=("total_engagement", "sum")
+    )
+
+def get_cluster_examples(df):
+    """Up to 2 example summaries per cluster and per (cluster, brand), truncated once"""
+    # Posts without a summary (skipped by the labeler; older files store them as "") are not examples
+    has_summary = df["post_summary"].notna() & (df["post_summary"].astype(str).str.strip() != "")
+    with_summary = df.loc[has_summary, ["cluster_1", "brand", "post_summary", "source_url"]]
+    
+    def first_two(keys):
+        picked = with_summary.groupby(keys, observed=True).head(2)
+        summaries = picked["post_summary"].astype(str)
+        picked = picked.assign(post_summary=summaries.str.slice(0, 150) + np.where(summaries.str.len() > 150, "...", ""))
+        return {key: group[["post_summary", "source_url"]] for key, group in picked.groupby(keys, observed=True)}
+    
+    return first_two("cluster_1"), first_two(["cluster_1", "brand"])
+
+def get_top_clusters_with_examples(cluster_totals, cluster_examples):
+    """Top 3 clusters by engagement across all brands, with up to 2 examples each"""
+    overall_examples, _ = cluster_examples
+    # Roll the per-brand totals up (a post belongs to one brand, so counts add up)
+    totals = cluster_totals.groupby(level="cluster_1", observed=True).sum()
+    
+    cluster_stats = (
+        totals.reset_index()
+        .sort_values("total_engagement", ascending=False)
+        .head(3)
+    )
+    
+    # Add up to 2 pre-grouped examples for each cluster
+    cluster_stats["examples"] = [overall_examples.get(name, NO_EXAMPLES) for name in cluster_stats["cluster_1"]]
+    
+    if not cluster_stats.empty:
+        total_posts = totals["posts_count"].sum()
+        cluster_stats["percentage"] = (cluster_stats["posts_count"] / total_posts * 100).round(1)
+    
+    return cluster_stats
+
+def get_brand_top_clusters(cluster_totals, cluster_examples):
+    """Top 3 clusters with up to 2 examples for every brand, from one sort and groupby"""
+    _, brand_examples = cluster_examples
+    ranked = cluster_totals.reset_index().sort_values("total_engagement", ascending=False, kind="stable")
+    brand_posts = ranked.groupby("brand", observed=True)["posts_count"].transform("sum")
+    ranked["percentage"] = (ranked["posts_count"] / brand_posts * 100).round(1)
+    
+    top = ranked.groupby("brand", observed=True).head(3)
+    top["examples"] = [brand_examples.get(key, NO_EXAMPLES) for key in zip(top["cluster_1"], top["brand"])]
+    return {brand: group.drop(columns="brand") for brand, group in top.groupby("brand", observed=True)}
+
+@st.cache_data(show_spinner=False)
+def compute_rollups(start_date, end_date, brands, master_mtime):
+    """Daily, top-post, cluster and brand-total rollups for one period and brand selection
+    (cached, so reruns that only change display options such as the chart type skip the groupbys)"""
+    df_14_days, df_current, df_previous, _, _ = load_data(start_date, end_date, master_mtime)
+    df_f = df_14_days[brand_mask(df_14_days, brands)]
+    
+    # Daily totals per brand for both chart tabs in one groupby (dates floored to the day, kept as datetime64)
+    daily = (
+        df_f.assign(date=df_f["date"].dt.floor("D"))
+        .groupby(["date", "brand", "platform"], as_index=False, observed=True, sort=False)
+        .agg(posts_count=("post_id", "nunique"), total_engagement=("total_engagement", "sum"))
+        .sort_values("date", kind="stable")
+    )
+    
+    post_rollup = (
+        df_f.groupby(["post_id", "brand", "platform"], as_index=False, observed=True)
+        .agg(engagement=("total_engagement", "max"), content=("content", "first"), source_url=("source_url", "first"))
+    )
+    brands_in_view = sorted(post_rollup["brand"].unique())
+    
+    brand_totals = (
+        df_f.groupby("brand", as_index=False, observed=True)
+        .agg(
+            posts=("post_id", "nunique"), 
+            total_engagement=("total_engagement", "sum"),
+            avg_engagement=("total_engagement", "mean"),
+            likes=("likes", "sum"),
+            comments=("comments", "sum"),
+            shares=("shares", "sum")
+        )
+        .sort_values("total_engagement", ascending=False)
+    )
+    
+    # Cluster totals and examples for the current and previous week
+    cluster_rollups = []
+    for week_df in (df_current, df_previous):
+        clustered = week_df[brand_mask(week_df, brands_in_view)]
+        clustered = clustered[clustered["cluster_1"].notna() & (clustered["cluster_1"] != "")]
+        totals, examples = get_cluster_brand_totals(clustered), get_cluster_examples(clustered)
+        cluster_rollups.append((totals, examples, get_brand_top_clusters(totals, examples)))
+    
+    return daily, post_rollup, brands_in_view, cluster_rollups, brand_totals
+
+def build_daily_chart(daily, value_col, value_title, chart_type):
+    """Bar or line chart of one daily per-brand metric; only the plotted columns are serialized"""
+    data = daily[["date", "brand", "platform", value_col]]
+    chart = alt.Chart(data)
+    chart = chart.mark_bar() if chart_type == "Bar Chart" else chart.mark_line(point=True)
+    return chart.encode(
+        x=alt.X("date:T", title="Day", axis=alt.Axis(format="%m/%d")),
+        y=alt.Y(f"{value_col}:Q", title=value_title),
+        color=alt.Color("brand:N", title="Brand"),
+        tooltip=["date", "brand", "platform", value_col],
+    ).properties(height=360)
+
 # ---- Sidebar Period Selection ----
 st.sidebar.header("📅 Analysis Period")
 
@@ -280,14 +443,15 @@ else:
     selected_end_date = config.ANALYSIS_END_DATE
 
 # Load data for selected period
-df_14_days, df_current, df_previous, start_date, end_date = load_data(selected_start_date, selected_end_date)
+master_mtime = master_data_mtime(FACEBOOK_FILE_PATH)
+df_14_days, df_current, df_previous, start_date, end_date = load_data(selected_start_date, selected_end_date, master_mtime)
 
 # Load summaries if available
 @st.cache_data(show_spinner=False)
 def load_summaries(selected_start_date=None, selected_end_date=None):
-    """Load weekly summaries from Excel file for the selected period"""
+    """Load weekly summaries from the summaries file for the selected period"""
     try:
-        summaries_df = pd.read_excel(config.SUMMARIES_XLSX)
+        summaries_df = load_master_data(Path(config.SUMMARIES_PARQUET))
         if summaries_df.empty:
             return None
         
@@ -295,14 +459,12 @@ def load_summaries(selected_start_date=None, selected_end_date=None):
         if not selected_start_date or not selected_end_date:
             return summaries_df.iloc[-1].to_dict()
         
-        # Find the summary row that matches the selected period
-        for i, row in summaries_df.iterrows():
-            row_start = pd.to_datetime(row['start_date']).date()
-            row_end = pd.to_datetime(row['end_date']).date()
-            
-            # Check if the dates match (allowing for small differences due to timezone/formatting)
-            if (row_start == selected_start_date and row_end == selected_end_date):
-                return row.to_dict()
+        # Find the summary row that matches the selected period (one vectorized parse per column)
+        starts = pd.to_datetime(summaries_df['start_date']).dt.date.to_numpy()
+        ends = pd.to_datetime(summaries_df['end_date']).dt.date.to_numpy()
+        idx = np.flatnonzero((starts == selected_start_date) & (ends == selected_end_date))
+        if idx.size:
+            return summaries_df.iloc[idx[0]].to_dict()
         
         # If no exact match found, return None
         st.warning(f"No summary found for period {selected_start_date} to {selected_end_date}")
@@ -322,10 +484,10 @@ st.title(f"Facebook Social Media Intelligence – {start_date.strftime('%B %d')}
 # Date range display
 st.caption(f"Analysis period: {start_date.strftime('%B %d')} - {end_date.strftime('%B %d, %Y')}")
 
-# Facebook-only data (no platform filtering needed)
-df_14_days_filtered = df_14_days.copy()
-df_current_filtered = df_current.copy()
-df_previous_filtered = df_previous.copy()
+# Facebook-only data (no platform filtering needed); the frames are only read below, so no copies
+df_14_days_filtered = df_14_days
+df_current_filtered = df_current
+df_previous_filtered = df_previous
 
 st.markdown("**Select Akropolis locations (always included):**")
 ak_cols = st.columns(4)
@@ -349,94 +511,45 @@ st.markdown("---")
 # ---- Comparison Statistics with Tabs ----
 st.subheader("📊 Performance vs Previous Week")
 
-# Get all brands in the selected cluster
-brands_universe = set(ak_selected) | set(SUBSETS_WITH_RETAIL.get(subset_name, []))
-all_brands = sorted(list(brands_universe))
+# Brands in the selected cluster, resolved once and shared by every section below
+brands_universe = SUBSETS_WITH_RETAIL_SETS.get(subset_name, frozenset()).union(ak_selected)
+all_brands = sorted(brands_universe)
 
 # Create tabs for each brand
 if all_brands:
     performance_tabs = st.tabs(all_brands)
     
+    # One groupby per week for all brands instead of separate sums per brand
+    brand_stats = calculate_brand_comparison_stats(df_current_filtered, df_previous_filtered, all_brands)
+    
     for i, brand in enumerate(all_brands):
         with performance_tabs[i]:
-            # Calculate stats for this specific brand using filtered data
-            brand_current = df_current_filtered[df_current_filtered["brand"] == brand]
-            brand_previous = df_previous_filtered[df_previous_filtered["brand"] == brand]
-            
-            current_posts = brand_current["post_id"].nunique()
-            current_engagement = brand_current["total_engagement"].sum()
-            current_likes = brand_current["likes"].sum()
-            current_comments = brand_current["comments"].sum()
-            current_shares = brand_current["shares"].sum()
-            
-            previous_posts = brand_previous["post_id"].nunique()
-            previous_engagement = brand_previous["total_engagement"].sum()
-            previous_likes = brand_previous["likes"].sum()
-            previous_comments = brand_previous["comments"].sum()
-            previous_shares = brand_previous["shares"].sum()
-            
-            # Calculate percentage changes - handle 0 previous week case
-            if previous_posts > 0:
-                posts_change = ((current_posts - previous_posts) / previous_posts * 100)
-            elif current_posts > 0:
-                posts_change = 100  # 100% increase from 0
-            else:
-                posts_change = 0  # Both are 0
-            
-            if previous_engagement > 0:
-                engagement_change = ((current_engagement - previous_engagement) / previous_engagement * 100)
-            elif current_engagement > 0:
-                engagement_change = 100  # 100% increase from 0
-            else:
-                engagement_change = 0  # Both are 0
-            
-            if previous_likes > 0:
-                likes_change = ((current_likes - previous_likes) / previous_likes * 100)
-            elif current_likes > 0:
-                likes_change = 100
-            else:
-                likes_change = 0
-            
-            if previous_comments > 0:
-                comments_change = ((current_comments - previous_comments) / previous_comments * 100)
-            elif current_comments > 0:
-                comments_change = 100
-            else:
-                comments_change = 0
-            
-            if previous_shares > 0:
-                shares_change = ((current_shares - previous_shares) / previous_shares * 100)
-            elif current_shares > 0:
-                shares_change = 100
-            else:
-                shares_change = 0
+            stats = brand_stats[brand]
+            current_posts = stats["current_posts"]
+            current_engagement = stats["current_engagement"]
+            previous_posts = stats["previous_posts"]
+            previous_engagement = stats["previous_engagement"]
+            posts_change = stats["posts_change"]
+            engagement_change = stats["engagement_change"]
             
-            # Create comparison cards for this brand (simplified)
-            col1, col2 = st.columns(2)
-            
-            with col1:
-                posts_color = get_color_for_change(posts_change)
-                st.markdown(f"""
-                <div style="border: 2px solid black; padding: 20px; border-radius: 10px; margin: 10px 0;">
-                    <h3 style="color: {posts_color}; margin: 0;">📝 Total Posts: {current_posts}</h3>
-                    <p style="color: {posts_color}; font-size: 18px; margin: 5px 0;">
-                        {posts_change:+.1f}% vs previous week
-                    </p>
-                    <p style="color: gray; font-size: 14px; margin: 0;">Previous week: {previous_posts} posts</p>
-                </div>
-                """, unsafe_allow_html=True)
-            
-            with col2:
-                engagement_color = get_color_for_change(engagement_change)
-                st.markdown(f"""
-                <div style="border: 2px solid black; padding: 20px; border-radius: 10px; margin: 10px 0;">
-                    <h3 style="color: {engagement_color}; margin: 0;">💬 Total Engagement: {int(current_engagement):,}</h3>
-                    <p style="color: {engagement_color}; font-size: 18px; margin: 5px 0;">
-                        {engagement_change:+.1f}% vs previous week
-                    </p>
-                    <p style="color: gray; font-size: 14px; margin: 0;">Previous week: {int(previous_engagement):,} engagement</p>
-                </div>
-                """, unsafe_allow_html=True)
+            # Both comparison cards side by side in one flex row, emitted with a single st.markdown
+            cards = (
+                COMPARISON_CARD_TEMPLATE.format_map({
+                    "color": get_color_for_change(posts_change),
+                    "title": "📝 Total Posts",
+                    "current": current_posts,
+                    "change": posts_change,
+                    "previous": f"{previous_posts} posts",
+                }),
+                COMPARISON_CARD_TEMPLATE.format_map({
+                    "color": get_color_for_change(engagement_change),
+                    "title": "💬 Total Engagement",
+                    "current": f"{int(current_engagement):,}",
+                    "change": engagement_change,
+                    "previous": f"{int(previous_engagement):,} engagement",
+                }),
+            )
+            st.markdown(COMPARISON_ROW_TEMPLATE.format_map({"cards": "".join(cards)}), unsafe_allow_html=True)
             
             # Show info if no data available
             if current_posts == 0 and previous_posts == 0:
@@ -509,16 +622,21 @@ else:
 st.markdown("---")
 
 # ---- Main Analysis Section ----
-# Filter to chosen brands using filtered data
-brands_universe = set(ak_selected) | set(SUBSETS_WITH_RETAIL.get(subset_name, []))
-df_f = df_14_days_filtered[df_14_days_filtered["brand"].isin(brands_universe)].copy()
-df_f_current = df_current_filtered[df_current_filtered["brand"].isin(brands_universe)].copy()
+# Rollups for the charts and rankings below, cached per period and brand selection
+# (compute_rollups does the filtering to the chosen brands)
+daily, post_rollup, brands_in_view, cluster_rollups, brand_totals = compute_rollups(
+    selected_start_date, selected_end_date, tuple(all_brands), master_mtime
+)
+(
+    (current_cluster_totals, current_cluster_examples, current_brand_clusters),
+    (prev_cluster_totals, prev_cluster_examples, prev_brand_clusters),
+) = cluster_rollups
 
 st.subheader(f"Facebook Social Media Intelligence ({config.ANALYSIS_START_DATE.strftime('%B %d')}-{config.ANALYSIS_END_DATE.strftime('%d, %Y')})")
 
 # Show platform information
 st.caption(
-    f"{df_f['brand'].nunique()} brands · {df_f['post_id'].nunique()} posts · {int(df_f['total_engagement'].sum()):,} total engagement · Facebook"
+    f"{len(brand_totals)} brands · {post_rollup['post_id'].nunique()} posts · {int(brand_totals['total_engagement'].sum()):,} total engagement · Facebook"
 )
 
 # ---- 1) Daily chart with tabs ----
@@ -536,187 +654,79 @@ chart_type = st.radio(
 tab1, tab2 = st.tabs(["📝 Posts Posted per Day", "💬 Engagement per Day"])
 
 with tab1:
-    # Group by date (not datetime) to get daily totals
-    df_f_copy = df_f.copy()
-    df_f_copy["date_only"] = df_f_copy["date"].dt.date
-    daily_posts = (
-        df_f_copy.groupby(["date_only", "brand", "platform"], as_index=False)
-        .agg(posts_count=("post_id", "nunique"))
-        .sort_values("date_only")
-    )
-    daily_posts["date"] = pd.to_datetime(daily_posts["date_only"])
-    
-    if daily_posts.empty:
+    if daily.empty:
         st.info("No posts found for these brands in the last 14 days.")
     else:
-        # Choose chart type based on selection
-        if chart_type == "Bar Chart":
-            chart = (
-                alt.Chart(daily_posts)
-                .mark_bar()
-                .encode(
-                    x=alt.X("date:T", title="Day", axis=alt.Axis(format="%m/%d")),
-                    y=alt.Y("posts_count:Q", title="Posts posted"),
-                    color=alt.Color("brand:N", title="Brand"),
-                    tooltip=["date", "brand", "platform", "posts_count"],
-                )
-                .properties(height=360)
-            )
-        else:  # Line Chart
-            chart = (
-                alt.Chart(daily_posts)
-                .mark_line(point=True)
-                .encode(
-                    x=alt.X("date:T", title="Day", axis=alt.Axis(format="%m/%d")),
-                    y=alt.Y("posts_count:Q", title="Posts posted"),
-                    color=alt.Color("brand:N", title="Brand"),
-                    tooltip=["date", "brand", "platform", "posts_count"],
-                )
-                .properties(height=360)
-            )
-        st.altair_chart(chart, use_container_width=True)
+        st.altair_chart(build_daily_chart(daily, "posts_count", "Posts posted", chart_type), use_container_width=True)
 
 with tab2:
-    # Group by date (not datetime) to get daily totals
-    df_f_copy2 = df_f.copy()
-    df_f_copy2["date_only"] = df_f_copy2["date"].dt.date
-    daily_engagement = (
-        df_f_copy2.groupby(["date_only", "brand", "platform"], as_index=False)
-        .agg(total_engagement=("total_engagement", "sum"))
-        .sort_values("date_only")
-    )
-    daily_engagement["date"] = pd.to_datetime(daily_engagement["date_only"])
-    
-    if daily_engagement.empty:
+    if daily.empty:
         st.info("No engagement data found for these brands in the last 14 days.")
     else:
-        # Choose chart type based on selection
-        if chart_type == "Bar Chart":
-            chart = (
-                alt.Chart(daily_engagement)
-                .mark_bar()
-                .encode(
-                    x=alt.X("date:T", title="Day", axis=alt.Axis(format="%m/%d")),
-                    y=alt.Y("total_engagement:Q", title="Total engagement"),
-                    color=alt.Color("brand:N", title="Brand"),
-                    tooltip=["date", "brand", "platform", "total_engagement"],
-                )
-                .properties(height=360)
-            )
-        else:  # Line Chart
-            chart = (
-                alt.Chart(daily_engagement)
-                .mark_line(point=True)
-                .encode(
-                    x=alt.X("date:T", title="Day", axis=alt.Axis(format="%m/%d")),
-                    y=alt.Y("total_engagement:Q", title="Total engagement"),
-                    color=alt.Color("brand:N", title="Brand"),
-                    tooltip=["date", "brand", "platform", "total_engagement"],
-                )
-                .properties(height=360)
-            )
-        st.altair_chart(chart, use_container_width=True)
+        st.altair_chart(build_daily_chart(daily, "total_engagement", "Total engagement", chart_type), use_container_width=True)
 
 # ---- 2) Top 3 posts by engagement ----
 st.markdown("#### Top 3 Posts by Engagement")
-post_rollup = (
-    df_f.groupby(["post_id", "brand", "platform"], as_index=False)
-    .agg(engagement=("total_engagement", "max"), content=("content", "first"), source_url=("source_url", "first"))
-)
-
 if post_rollup.empty:
     st.info("No posts to show.")
 else:
-    brands_in_view = sorted(post_rollup["brand"].unique())
     tabs = st.tabs(["Overall"] + brands_in_view)
     
     def top3(d):
-        return d.sort_values("engagement", ascending=False).head(3).reset_index(drop=True)
+        return d.nlargest(3, "engagement").reset_index(drop=True)
+    
+    # Split the rollup by brand once instead of filtering it in every tab
+    post_rollup_by_brand = dict(tuple(post_rollup.groupby("brand", observed=True, sort=False)))
     
     with tabs[0]:
         top3_overall = top3(post_rollup)
-        for idx, row in top3_overall.iterrows():
-            st.markdown(create_post_card(row["brand"], row["engagement"], row["content"], row["post_id"], row["platform"], row["source_url"]), unsafe_allow_html=True)
+        render_cards([
+            create_post_card(row.brand, row.engagement, row.content, row.post_id, row.platform, row.source_url)
+            for row in top3_overall.itertuples(index=False)
+        ])
     
     for i, b in enumerate(brands_in_view, start=1):
         with tabs[i]:
-            top3_brand = top3(post_rollup[post_rollup["brand"] == b])
-            for idx, row in top3_brand.iterrows():
-                st.markdown(create_post_card(row["brand"], row["engagement"], row["content"], row["post_id"], row["platform"], row["source_url"]), unsafe_allow_html=True)
+            top3_brand = top3(post_rollup_by_brand[b])
+            render_cards([
+                create_post_card(row.brand, row.engagement, row.content, row.post_id, row.platform, row.source_url)
+                for row in top3_brand.itertuples(index=False)
+            ])
 
 # ---- 3) Top 3 clusters comparison ----
 st.markdown("#### Top 3 Clusters: This Week vs Previous Week")
 
-# Current week clusters
-df_current_clusters = df_current[df_current["brand"].isin(brands_in_view)]
-df_current_clusters = df_current_clusters[df_current_clusters["cluster_1"].notna() & (df_current_clusters["cluster_1"] != "")]
-
-# Previous week clusters
-df_prev_clusters = df_previous[df_previous["brand"].isin(brands_in_view)]
-df_prev_clusters = df_prev_clusters[df_prev_clusters["cluster_1"].notna() & (df_prev_clusters["cluster_1"] != "")]
-
-if df_current_clusters.empty and df_prev_clusters.empty:
+if current_cluster_totals.empty and prev_cluster_totals.empty:
     st.info("No cluster data available for comparison.")
 else:
     # Create comparison tabs
-    comparison_brands = sorted(set(df_current_clusters["brand"].unique()) | set(df_prev_clusters["brand"].unique()))
+    comparison_brands = sorted(
+        set(current_cluster_totals.index.get_level_values("brand")) | set(prev_cluster_totals.index.get_level_values("brand"))
+    )
     comparison_tabs = st.tabs(["Overall"] + comparison_brands)
     
-    def get_top_clusters_with_examples(df, brand_filter=None):
-        if brand_filter:
-            df_filtered = df[df["brand"] == brand_filter]
-        else:
-            df_filtered = df
-        
-        cluster_stats = (
-            df_filtered.groupby("cluster_1", as_index=False)
-            .agg(
-                posts_count=("post_id", "nunique"),
-                total_engagement=("total_engagement", "sum")
-            )
-            .sort_values("total_engagement", ascending=False)
-            .head(3)
-        )
-        
-        # Add examples for each cluster
-        cluster_examples = []
-        for _, row in cluster_stats.iterrows():
-            cluster_name = row["cluster_1"]
-            # Get up to 2 examples from post_summary for this cluster
-            examples = (
-                df_filtered[df_filtered["cluster_1"] == cluster_name]
-                [["post_summary", "source_url"]]
-                .dropna(subset=["post_summary"])
-                .head(2)
-            )
-            cluster_examples.append(examples)
-        
-        cluster_stats["examples"] = cluster_examples
-        
-        if not cluster_stats.empty:
-            total_posts = df_filtered["post_id"].nunique()
-            cluster_stats["percentage"] = (cluster_stats["posts_count"] / total_posts * 100).round(1)
-        
-        return cluster_stats
-    
     with comparison_tabs[0]:
         col1, col2 = st.columns(2)
         
         with col1:
             st.markdown("**This Week**")
-            current_overall = get_top_clusters_with_examples(df_current_clusters)
+            current_overall = get_top_clusters_with_examples(current_cluster_totals, current_cluster_examples)
             if not current_overall.empty:
-                for idx, row in current_overall.iterrows():
-                    st.markdown(create_cluster_card_with_examples(row["cluster_1"], row["posts_count"], row["total_engagement"], row["examples"]), unsafe_allow_html=True)
+                render_cards([
+                    create_cluster_card_with_examples(row.cluster_1, row.posts_count, row.total_engagement, row.examples)
+                    for row in current_overall.itertuples(index=False)
+                ])
             else:
                 st.info("No data for this week")
         
         with col2:
             st.markdown("**Previous Week**")
-            prev_overall = get_top_clusters_with_examples(df_prev_clusters)
+            prev_overall = get_top_clusters_with_examples(prev_cluster_totals, prev_cluster_examples)
             if not prev_overall.empty:
-                for idx, row in prev_overall.iterrows():
-                    st.markdown(create_cluster_card_with_examples(row["cluster_1"], row["posts_count"], row["total_engagement"], row["examples"]), unsafe_allow_html=True)
+                render_cards([
+                    create_cluster_card_with_examples(row.cluster_1, row.posts_count, row.total_engagement, row.examples)
+                    for row in prev_overall.itertuples(index=False)
+                ])
             else:
                 st.info("No data for previous week")
     
@@ -726,34 +736,26 @@ else:
             
             with col1:
                 st.markdown(f"**{b} - This Week**")
-                current_brand = get_top_clusters_with_examples(df_current_clusters, b)
-                if not current_brand.empty:
-                    for idx, row in current_brand.iterrows():
-                        st.markdown(create_cluster_card_with_examples(row["cluster_1"], row["posts_count"], row["total_engagement"], row["examples"]), unsafe_allow_html=True)
+                current_brand = current_brand_clusters.get(b)
+                if current_brand is not None:
+                    render_cards([
+                        create_cluster_card_with_examples(row.cluster_1, row.posts_count, row.total_engagement, row.examples)
+                        for row in current_brand.itertuples(index=False)
+                    ])
                 else:
                     st.info("No data for this week")
             
             with col2:
                 st.markdown(f"**{b} - Previous Week**")
-                prev_brand = get_top_clusters_with_examples(df_prev_clusters, b)
-                if not prev_brand.empty:
-                    for idx, row in prev_brand.iterrows():
-                        st.markdown(create_cluster_card_with_examples(row["cluster_1"], row["posts_count"], row["total_engagement"], row["examples"]), unsafe_allow_html=True)
+                prev_brand = prev_brand_clusters.get(b)
+                if prev_brand is not None:
+                    render_cards([
+                        create_cluster_card_with_examples(row.cluster_1, row.posts_count, row.total_engagement, row.examples)
+                        for row in prev_brand.itertuples(index=False)
+                    ])
                 else:
                     st.info("No data for previous week")
 
 # ---- Optional totals by brand ----
 with st.expander("Totals by brand"):
-    totals = (
-        df_f.groupby("brand", as_index=False)
-        .agg(
-            posts=("post_id", "nunique"), 
-            total_engagement=("total_engagement", "sum"),
-            avg_engagement=("total_engagement", "mean"),
-            likes=("likes", "sum"),
-            comments=("comments", "sum"),
-            shares=("shares", "sum")
-        )
-        .sort_values("total_engagement", ascending=False)
-    )
-    st.dataframe(totals, use_container_width=True)
\ No newline at end of file
+    st.dataframe(brand_totals, use_container_width=True)
\ No newline at end of file
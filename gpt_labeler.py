@@ -4,25 +4,37 @@ GPT Labeler for Social Media Posts
 Generates summaries and categorizes social media content using OpenAI GPT
 """
 
+import io
 import os
 import re
 import json
+import time
+import asyncio
 import hashlib
+import functools
 from datetime import datetime
-from concurrent.futures import ThreadPoolExecutor, as_completed
 from typing import List, Dict, Tuple
+import orjson
 import pandas as pd
-from tqdm import tqdm
-from openai import OpenAI
+from tqdm.asyncio import tqdm_asyncio
+from openai import OpenAI, AsyncOpenAI
 import config
 
+try:
+    import tiktoken  # exact token counts for the rate limiter
+except ImportError:
+    tiktoken = None
+
 # ----------------------------
 # CONFIG
 # ----------------------------
 MODEL = "gpt-4o-mini"
 TEMPERATURE = 0
-MAX_WORKERS = 10  # Conservative for rate limits
+MAX_WORKERS = config.GPT_MAX_WORKERS  # Concurrent requests; throughput is bounded by the rate limiter
 MAX_CHARS_PER_POST = 1400
+MAX_TOKENS_PER_POST = 350  # token budget per post in the prompt (when tiktoken is available)
+BATCH_SIZE = 20  # posts sent per GPT request (system prompt is paid once per batch)
+LABEL_TOKENS_PER_POST = 70  # completion budget per post (summary + theme numbers)
 
 # Column names for social media data
 COL_CONTENT = "content"
@@ -31,6 +43,12 @@ COL_SUMMARY = "post_summary"
 COL_CLUSTER_1 = "cluster_1"  # Most appropriate
 COL_CLUSTER_2 = "cluster_2"  # Second most appropriate
 COL_CLUSTER_3 = "cluster_3"  # Third most appropriate
+LABEL_COLUMNS = [COL_SUMMARY, COL_CLUSTER_1, COL_CLUSTER_2, COL_CLUSTER_3]
+
+# Text cleanup patterns, compiled once
+NEWLINES_RE = re.compile(r"\n+")
+SPACES_RE = re.compile(r"[ \t]+")
+URL_RE = re.compile(r"https?://\S+")
 
 # ----------------------------
 # Helpers
@@ -40,8 +58,8 @@ def normalize_text(s):
     if not isinstance(s, str):
         return ""
     s = s.replace("\r", "\n")
-    s = re.sub(r"\n+", "\n", s)
-    s = re.sub(r"[ \t]+", " ", s)
+    s = NEWLINES_RE.sub("\n", s)
+    s = SPACES_RE.sub(" ", s)
     return s.strip()
 
 def compact_text(s, limit=MAX_CHARS_PER_POST):
@@ -49,98 +67,190 @@ def compact_text(s, limit=MAX_CHARS_PER_POST):
     s = normalize_text(s)
     return s if len(s) <= limit else (s[:limit] + "…")
 
+def compact_series(s: pd.Series, limit=MAX_CHARS_PER_POST) -> pd.Series:
+    """Vectorized compact_text: normalize every value (non-strings become "") and truncate to limit."""
+    s = (
+        s.astype(object)
+        .str.replace("\r", "\n", regex=False)
+        .str.replace(NEWLINES_RE, "\n", regex=True)
+        .str.replace(SPACES_RE, " ", regex=True)
+        .str.strip()
+        .fillna("")
+    )
+    return s.mask(s.str.len() > limit, s.str.slice(0, limit) + "…")
+
 def hash_text(s: str) -> str:
     """Create hash for text deduplication."""
     return hashlib.sha256(s.encode("utf-8")).hexdigest()
 
-def parse_label_line(text):
-    """Parse the label line format: 'Labels: <Theme A>; <Theme B>; <Theme C>'"""
-    if not isinstance(text, str):
-        return [None, None, None]
-    m = re.search(r"Labels\s*:\s*(.+)$", text.strip(), flags=re.I)
-    if not m:
-        return [None, None, None]
-    parts = [p.strip() for p in m.group(1).split(";") if p.strip()]
-    parts = parts[:3]
-    while len(parts) < 3:
-        parts.append(None)
-    return parts
-
 # ----------------------------
 # GPT Prompts for Social Media
 # ----------------------------
-SUMMARY_SYSTEM_PROMPT = (
-    "You are a precise annotator of social media posts.\n"
-    "Given a social media post's content, return a ONE-SENTENCE description of the main message, promotion, or announcement.\n"
+SUMMARY_INSTRUCTIONS = (
+    "SUMMARY: a ONE-SENTENCE description of the post's main message, promotion, or announcement.\n"
     "Rules:\n"
     "- If a clear single product/service/promotion/event/announcement is identifiable, describe it succinctly in one sentence.\n"
     "- If the post is only brand building, company news, or general content with no concrete offer, still summarize the post in one sentence.\n"
     "- Keep it factual (no hype), <= 140 characters where feasible, no emojis, no hashtags, no URLs.\n"
     "- Treat promotions/discounts/events/contests as valid 'products' (e.g., '50% off weekend sale at Maxima').\n"
     "- ALWAYS return everything in English, even if the post is in another language!\n"
-    'Return STRICT JSON ONLY as: {"summary":"<ONE_SENTENCE_OR_NONE>"}'
 )
 
 
-CLUSTER_SYSTEM_PROMPT = (
-    "You are labeling a social media post against a FIXED taxonomy.\n"
+# Fixed taxonomy: (theme, illustrative examples). The model answers with theme
+# numbers, constrained by LABEL_RESPONSE_FORMAT; 0 is OTHER.
+CLUSTER_THEMES = (
+    ("Store Openings and Tenant Updates", "new store opening, major renovation, new tenant announcement."),
+    ("Seasonal Promotions and Discounts", "Christmas sale, Black Friday offers, Easter weekend deals, summer clearance, back-to-school campaigns."),
+    ("General Discounts and Promotions", "permanent weekly sale, everyday low prices, loyalty-card discounts."),
+    ("Competitions and Giveaways", "social media raffle, prize draw, scholarship contest."),
+    ("Events and Experiences", "live concerts, family festivals, community fairs, interactive installations."),
+    ("Fashion and Style Highlights", "clothing trends, styling tips, seasonal wardrobe ideas."),
+    ("Food and Dining Specials", "restaurant or café openings, tasting events, featured recipes, bakery showcases."),
+    ("Beauty and Personal Care", "hair salon promotions, skincare demos, cosmetic discounts."),
+    ("Digital or App-Exclusive Offers", "mobile-app coupons, e-shop exclusives, online order perks."),
+    ("Holiday and Celebration Greetings", "holiday wishes, themed decorations, festive atmosphere posts."),
+    ("Shopping Experience and Atmosphere", "free parking, stroller rental, pet-friendly policy, upgraded family rooms, mall gift cards."),
+    ("Travel and Leisure Essentials", "luggage sales, vacation prep, travel accessories."),
+    ("Sustainability and Eco-Actions", "recycling initiatives, zero-waste fairs, green programs."),
+    ("Services and Repairs", "tailoring, electronics service desks, key-cutting, watch repair."),
+    ("Health and Social Responsibility", "free health checks, blood drives, charitable or community aid, inclusive social projects."),
+    ("Books, Learning and Educational Products", "book fairs, stationery launches, coding kits."),
+    ("Home & Living / Fabric Care Tips", "furniture and décor inspiration, fabric-care guidance, interior refresh ideas."),
+    ("Gifting and Accessories", "gift ideas, jewelry highlights, special flower or accessory offers."),
+    ("Financial and Business Performance", "earnings results, credit ratings, investment plans, large-scale capital projects."),
+    ("Leadership Appointments and HR News", "executive hires, leadership promotions, organizational restructuring."),
+    ("Employee Development and Workplace Culture", "career growth, internal mobility, employee stories, well-being programs."),
+    ("Awards and Industry Recognition", "industry prizes, rankings, certifications, external recognition."),
+    ("Supply Chain and Product Quality", "supplier policies, quality-control measures, sourcing standards, logistics achievements."),
+    ("Corporate Partnerships and Sponsorships", "strategic alliances, co-branded campaigns, sports or cultural sponsorships."),
+    ("Thought Leadership and Expert Commentary", "market insights, opinion pieces, expert interviews, future-of-industry perspectives."),
+)
+CLUSTER_NAMES = ("OTHER",) + tuple(name for name, _ in CLUSTER_THEMES)
+
+CLUSTER_INSTRUCTIONS = (
+    "LABELS: 1 to 3 themes from a FIXED taxonomy.\n"
     "Rules:\n"
     "- Choose 1 to 3 labels from ALLOWED THEMES (listed below with examples).\n"
     "- The FIRST label must be the single MOST APPROPRIATE cluster.\n"
-    "- If no cluster fits, output OTHER.\n"
+    "- If no cluster fits, output 0 (OTHER).\n"
     "- VERY IMPORTANT: do NOT force-fit; keep OTHER if uncertain.\n"
-    "- Output ENGLISH only in EXACTLY this format:\n"
-    "Labels: <Theme A>; <Theme B>; <Theme C>\n"
-    "(Use 1–3 labels; separate with semicolons; do not number them.)\n"
+    "- Output 1–3 labels, most appropriate first.\n"
     "- Prefer the most specific matching themes.\n\n"
     "Output requirement:\n"
-    "- Each cluster name is followed by a dash and examples. RETURN ONLY the text before the dash (the cluster name itself), not the examples.\n"
-    "  Example: If you pick 'Seasonal Promotions and Discounts — Christmas sale, Black Friday offers', output just 'Seasonal Promotions and Discounts'.\n\n"
+    "- RETURN ONLY THE NUMBER of each chosen theme (e.g. 2 for Seasonal Promotions and Discounts), not its name or examples.\n\n"
     "Key distinctions:\n"
     "- Seasonal Promotions and Discounts = time-bound events tied to a season, holiday, or calendar moment (e.g. Christmas sale, Black Friday, back-to-school, summer clearance, flower promos for a holiday).\n"
     "- General Discounts and Promotions = price cuts or deals not tied to a season or holiday (e.g. permanent weekly sale, everyday low prices).\n"
-    "Available clusters (with illustrative examples—DO NOT RETURN the examples, just the theme name before the dash!):\n"
-    "1. Store Openings and Tenant Updates — new store opening, major renovation, new tenant announcement.\n"
-    "2. Seasonal Promotions and Discounts — Christmas sale, Black Friday offers, Easter weekend deals, summer clearance, back-to-school campaigns.\n"
-    "3. Competitions and Giveaways — social media raffle, prize draw, scholarship contest.\n"
-    "4. Events and Experiences — live concerts, family festivals, community fairs, interactive installations.\n"
-    "5. Fashion and Style Highlights — clothing trends, styling tips, seasonal wardrobe ideas.\n"
-    "6. Food and Dining Specials — restaurant or café openings, tasting events, featured recipes, bakery showcases.\n"
-    "7. Beauty and Personal Care — hair salon promotions, skincare demos, cosmetic discounts.\n"
-    "8. Digital or App-Exclusive Offers — mobile-app coupons, e-shop exclusives, online order perks.\n"
-    "9. Holiday and Celebration Greetings — holiday wishes, themed decorations, festive atmosphere posts.\n"
-    "10. Shopping Experience and Atmosphere — free parking, stroller rental, pet-friendly policy, upgraded family rooms, mall gift cards.\n"
-    "11. Travel and Leisure Essentials — luggage sales, vacation prep, travel accessories.\n"
-    "12. Sustainability and Eco-Actions — recycling initiatives, zero-waste fairs, green programs.\n"
-    "13. Services and Repairs — tailoring, electronics service desks, key-cutting, watch repair.\n"
-    "14. Health and Social Responsibility — free health checks, blood drives, charitable or community aid, inclusive social projects.\n"
-    "15. Books, Learning and Educational Products — book fairs, stationery launches, coding kits.\n"
-    "16. Home & Living / Fabric Care Tips — furniture and décor inspiration, fabric-care guidance, interior refresh ideas.\n"
-    "17. Gifting and Accessories — gift ideas, jewelry highlights, special flower or accessory offers.\n"
-    "18. Financial and Business Performance — earnings results, credit ratings, investment plans, large-scale capital projects.\n"
-    "19. Leadership Appointments and HR News — executive hires, leadership promotions, organizational restructuring.\n"
-    "20. Employee Development and Workplace Culture — career growth, internal mobility, employee stories, well-being programs.\n"
-    "21. Awards and Industry Recognition — industry prizes, rankings, certifications, external recognition.\n"
-    "22. Supply Chain and Product Quality — supplier policies, quality-control measures, sourcing standards, logistics achievements.\n"
-    "23. Corporate Partnerships and Sponsorships — strategic alliances, co-branded campaigns, sports or cultural sponsorships.\n"
-    "24. Thought Leadership and Expert Commentary — market insights, opinion pieces, expert interviews, future-of-industry perspectives.\n"
+    "ALLOWED THEMES (number. theme — illustrative examples):\n"
+    "0. OTHER — nothing above fits.\n"
+    + "".join(f"{number}. {name} — {examples}\n" for number, (name, examples) in enumerate(CLUSTER_THEMES, 1))
 )
 
+# One request per batch returns both the summary and the labels of every post
+LABEL_SYSTEM_PROMPT = (
+    "You are a precise annotator of social media posts.\n"
+    "You are given several numbered social media posts. For EACH post, return a SUMMARY and LABELS.\n\n"
+    + SUMMARY_INSTRUCTIONS
+    + "\n"
+    + CLUSTER_INSTRUCTIONS
+    + "\nReturn exactly one entry per post, using the post number as i."
+)
+
+# Structured output: labels can only be valid theme numbers
+LABEL_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "post_labels",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {
+                "results": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            "i": {"type": "integer"},
+                            "summary": {"type": "string"},
+                            "labels": {
+                                "type": "array",
+                                "items": {"type": "integer", "enum": list(range(len(CLUSTER_NAMES)))},
+                            },
+                        },
+                        "required": ["i", "summary", "labels"],
+                        "additionalProperties": False,
+                    },
+                },
+            },
+            "required": ["results"],
+            "additionalProperties": False,
+        },
+    },
+}
+
+# Cached labels are only valid for the model, prompt and taxonomy that produced them:
+# this digest is part of every cache key, so changing any of them (e.g. renumbering
+# the themes) starts from an empty cache instead of serving labels of the old taxonomy
+LABEL_CACHE_VERSION = hash_text(
+    json.dumps([MODEL, TEMPERATURE, LABEL_SYSTEM_PROMPT, LABEL_RESPONSE_FORMAT], sort_keys=True)
+)[:16]
 
 
-def build_summary_prompt(post_content: str) -> str:
-    """Build user prompt for summary generation."""
-    return f"Social media post content:\n{post_content}"
 
-def build_cluster_prompt(post_content: str) -> str:
-    """Build user prompt for cluster categorization."""
-    return f"Social media post:\n{post_content}\n\nChoose 1–3 from ALLOWED THEMES."
+def build_batch_posts(contents: List[str]) -> str:
+    """Number the posts of one batch: 'Post 1:\n...\n\nPost 2:\n...'"""
+    return "\n\n".join(f"Post {i}:\n{content}" for i, content in enumerate(contents, 1))
+
+def build_label_prompt(contents: List[str]) -> str:
+    """Build user prompt for summary + cluster labeling of a batch of posts."""
+    return f"Social media posts:\n\n{build_batch_posts(contents)}\n\nSummarize each post and choose 1–3 from ALLOWED THEMES."
+
+def parse_json_reply(raw: str) -> dict:
+    """Parse a JSON object reply (strict JSON thanks to the response format; the
+    bracket slice only covers stray text around it)."""
+    try:
+        return orjson.loads(raw)
+    except orjson.JSONDecodeError:
+        return orjson.loads(raw[raw.find("{"):raw.rfind("}")+1])
+
+def items_by_index(items) -> Dict[int, dict]:
+    """Map the 1-based post number 'i' of each reply entry to the entry."""
+    by_index = {}
+    for item in items or []:
+        if not isinstance(item, dict):
+            continue
+        try:
+            by_index[int(item.get("i"))] = item
+        except (TypeError, ValueError):
+            continue
+    return by_index
+
+def clean_summary(summary) -> str:
+    """Tidy one model summary: no URLs, normalized whitespace, <= 160 chars."""
+    summary = (summary or "").strip() if isinstance(summary, str) else ""
+    if not summary or summary.upper() in ("NULL", "NONE"):
+        return "NONE"
+    summary = URL_RE.sub('', summary)
+    summary = normalize_text(summary)
+    if len(summary) > 160:
+        summary = summary[:160].rstrip(" ,.;:") + "."
+    return summary
+
+def ranked_clusters(labels) -> Tuple[str, str, str]:
+    """Decode the model's theme numbers into three ranked cluster names."""
+    names = []
+    for number in labels or []:
+        if isinstance(number, int) and 0 <= number < len(CLUSTER_NAMES) and CLUSTER_NAMES[number] not in names:
+            names.append(CLUSTER_NAMES[number])
+    names = names[:3] + [None] * (3 - len(names[:3]))
+    return names[0] or "NONE", names[1], names[2]
 
 # ----------------------------
 # Model calls
 # ----------------------------
-def get_openai_client() -> OpenAI:
-    """Get OpenAI client with API key from environment or config."""
+def get_api_key() -> str:
+    """Get OpenAI API key from environment or config."""
     api_key = os.getenv("OPENAI_API_KEY")
     if not api_key:
         # Try to import from config if available
@@ -152,74 +262,361 @@ def get_openai_client() -> OpenAI:
     if not api_key:
         raise ValueError("Set OPENAI_API_KEY environment variable or add it to config.py")
     
-    return OpenAI(api_key=api_key)
+    return api_key
+
+@functools.lru_cache(maxsize=1)
+def get_openai_client() -> OpenAI:
+    """Get the shared OpenAI client (one connection pool per process)."""
+    return OpenAI(api_key=get_api_key(), max_retries=config.GPT_MAX_RETRIES)
+
+def get_async_openai_client() -> AsyncOpenAI:
+    """Get async OpenAI client with API key from environment or config.
+    Created once per labeling run (its connections belong to that run's event loop).
+    Rate-limit, server and connection errors are retried by the client with
+    jittered exponential backoff that honors Retry-After."""
+    return AsyncOpenAI(api_key=get_api_key(), max_retries=config.GPT_MAX_RETRIES)
 
-def generate_summary(post_content: str) -> str:
-    """Generate a one-sentence summary for a social media post."""
+# ----------------------------
+# Rate limiting
+# ----------------------------
+@functools.lru_cache(maxsize=1)
+def get_encoding():
+    """tiktoken encoding of MODEL, or None when tiktoken is unavailable."""
+    if tiktoken is None:
+        return None
     try:
-        client = get_openai_client()
-        resp = client.chat.completions.create(
-            model=MODEL,
-            messages=[
-                {"role": "system", "content": SUMMARY_SYSTEM_PROMPT},
-                {"role": "user", "content": build_summary_prompt(post_content)},
-            ],
-            temperature=TEMPERATURE,
-            response_format={"type": "json_object"},
-            max_tokens=200,
-        )
-        raw = (resp.choices[0].message.content or "").strip()
-        # Parse JSON strictly or by bracket slice
-        data = json.loads(raw) if raw.startswith("{") else json.loads(raw[raw.find("{"):raw.rfind("}")+1])
-        summary = (data.get("summary") or "").strip()
-        if not summary or summary.upper() == "NULL":
-            return "NONE"
-        summary = re.sub(r'https?://\S+', '', summary)
-        summary = normalize_text(summary)
-        if len(summary) > 160:
-            summary = summary[:160].rstrip(" ,.;:") + "."
-        return summary
+        return tiktoken.encoding_for_model(MODEL)
     except Exception as e:
-        print(f"[ERROR] Summary generation failed: {e}")
-        return "NONE"
+        print(f"[WARNING] tiktoken encoding unavailable, estimating tokens from length: {e}")
+        return None
+
+@functools.lru_cache(maxsize=32)
+def count_tokens(text: str) -> int:
+    """Token count of text (about 4 characters per token without tiktoken)."""
+    encoding = get_encoding()
+    if encoding is None:
+        return len(text) // 4 + 1
+    return len(encoding.encode(text))
 
-def generate_clusters(post_content: str) -> Tuple[str, str, str]:
-    """Generate cluster categories for a social media post."""
+def truncate_to_tokens(texts: List[str], max_tokens: int = MAX_TOKENS_PER_POST) -> List[str]:
+    """Cut each text to max_tokens tokens (texts are left as they are without tiktoken,
+    MAX_CHARS_PER_POST already bounds them)."""
+    encoding = get_encoding()
+    if encoding is None or not texts:
+        return texts
+    return [
+        text if len(ids) <= max_tokens else encoding.decode(ids[:max_tokens]) + "…"
+        for text, ids in zip(texts, encoding.encode_ordinary_batch(texts))
+    ]
+
+def estimate_request_tokens(request: dict) -> int:
+    """Tokens a chat completion request counts against the TPM limit: prompt + max completion."""
+    prompt_tokens = sum(count_tokens(message["content"]) + 4 for message in request["messages"])
+    return prompt_tokens + request.get("max_tokens", 0)
+
+class TokenBucket:
+    """Leaky bucket refilled continuously at a per-minute rate."""
+    
+    def __init__(self, per_minute: int):
+        self.capacity = per_minute
+        self.rate = per_minute / 60.0
+        self.available = float(per_minute)
+        self.updated = time.monotonic()
+    
+    def wait_time(self, amount: int) -> float:
+        """Seconds until amount can be taken (0 if it can be taken now)."""
+        now = time.monotonic()
+        self.available = min(self.capacity, self.available + (now - self.updated) * self.rate)
+        self.updated = now
+        return max(0.0, (min(amount, self.capacity) - self.available) / self.rate)
+    
+    def take(self, amount: int) -> None:
+        self.available -= min(amount, self.capacity)
+
+class RequestThrottle:
+    """Bounds concurrent requests and keeps requests/tokens per minute under the account limits."""
+    
+    def __init__(self, max_concurrent: int, rpm: int = None, tpm: int = None):
+        self.semaphore = asyncio.Semaphore(max_concurrent)
+        self.requests = TokenBucket(rpm or config.GPT_RPM_LIMIT)
+        self.tokens = TokenBucket(tpm or config.GPT_TPM_LIMIT)
+        self.lock = asyncio.Lock()
+    
+    async def acquire(self, tokens: int) -> None:
+        """Wait until one more request of the given token size fits the per-minute budgets."""
+        async with self.lock:
+            while True:
+                delay = max(self.requests.wait_time(1), self.tokens.wait_time(tokens))
+                if delay <= 0:
+                    break
+                await asyncio.sleep(delay)
+            self.requests.take(1)
+            self.tokens.take(tokens)
+
+async def create_completion(client: AsyncOpenAI, throttle: RequestThrottle, **kwargs):
+    """Run one chat completion within the throttle's concurrency and per-minute budgets."""
+    async with throttle.semaphore:
+        await throttle.acquire(estimate_request_tokens(kwargs))
+        return await client.chat.completions.create(**kwargs)
+
+def build_label_request(contents: List[str]) -> dict:
+    """Chat completion parameters that summarize and cluster a batch of posts."""
+    return {
+        "model": MODEL,
+        "messages": [
+            {"role": "system", "content": LABEL_SYSTEM_PROMPT},
+            {"role": "user", "content": build_label_prompt(contents)},
+        ],
+        "temperature": TEMPERATURE,
+        "response_format": LABEL_RESPONSE_FORMAT,
+        "max_tokens": LABEL_TOKENS_PER_POST * len(contents) + 50,
+    }
+
+def parse_label_reply(raw: str, count: int) -> List[Tuple[str, str, str, str]]:
+    """Split one batch reply into (summary, cluster1, cluster2, cluster3) per post."""
+    results = items_by_index(parse_json_reply(raw).get("results"))
+    labeled = []
+    for i in range(1, count + 1):
+        item = results.get(i, {})
+        labeled.append((clean_summary(item.get("summary")), *ranked_clusters(item.get("labels"))))
+    return labeled
+
+def failed_labels(count: int) -> List[Tuple[str, str, str, str]]:
+    """Placeholder labels for posts whose request failed."""
+    return [("NONE", "NONE", None, None)] * count
+
+async def process_batch_with_gpt(client: AsyncOpenAI, throttle: RequestThrottle, contents: List[str]) -> List[Tuple[str, str, str, str]]:
+    """Summarize and cluster a batch of posts with a single request."""
     try:
-        client = get_openai_client()
-        resp = client.chat.completions.create(
-            model=MODEL,
-            messages=[
-                {"role": "system", "content": CLUSTER_SYSTEM_PROMPT},
-                {"role": "user", "content": build_cluster_prompt(post_content)},
-            ],
-            temperature=TEMPERATURE,
-            max_tokens=80,
-        )
-        raw = (resp.choices[0].message.content or "").strip()
-        # Parse the label line format
-        clusters = parse_label_line(raw)
-        return clusters[0], clusters[1], clusters[2]
+        resp = await create_completion(client, throttle, **build_label_request(contents))
+        return parse_label_reply(resp.choices[0].message.content or "", len(contents))
     except Exception as e:
-        print(f"[ERROR] Cluster generation failed: {e}")
-        return "NONE", None, None
+        print(f"[ERROR] GPT labeling failed for a batch of {len(contents)} posts: {e}")
+        return failed_labels(len(contents))
 
-def process_post_with_gpt(post_content: str) -> Tuple[str, str, str, str]:
-    """Process a single social media post to generate summary and three ranked clusters."""
-    summary = generate_summary(post_content)
-    cluster1, cluster2, cluster3 = generate_clusters(post_content)
-    return summary, cluster1, cluster2, cluster3
+async def process_posts_with_gpt(contents: List[str], max_workers: int, batch_size: int = BATCH_SIZE,
+                                 on_batch=None) -> List[Tuple[str, str, str, str]]:
+    """Label all posts in batches of batch_size, with at most max_workers API calls in flight
+    and requests/tokens per minute kept under config.GPT_RPM_LIMIT / GPT_TPM_LIMIT.
+    on_batch(start, results) is called as each batch finishes (start = index of its first post)."""
+    client = get_async_openai_client()
+    throttle = RequestThrottle(max_workers)
+    
+    async def label_batch(start: int) -> List[Tuple[str, str, str, str]]:
+        results = await process_batch_with_gpt(client, throttle, contents[start:start + batch_size])
+        if on_batch is not None:
+            on_batch(start, results)
+        return results
+    
+    try:
+        batch_results = await tqdm_asyncio.gather(
+            *(label_batch(start) for start in range(0, len(contents), batch_size)),
+            desc="GPT Labeling (batches)",
+        )
+    finally:
+        await client.close()
+    return [result for batch in batch_results for result in batch]
+
+def wait_for_batch_job(client: OpenAI, batch_id: str, max_wait_hours: float = None):
+    """
+    Poll an OpenAI Batch API job until it reaches a final state.
+    
+    Args:
+        client: OpenAI client
+        batch_id: ID of the batch job
+        max_wait_hours: Maximum wait time in hours (uses config.GPT_BATCH_MAX_WAIT_HOURS if None)
+    
+    Returns:
+        The final batch object, or None on timeout
+    """
+    if max_wait_hours is None:
+        max_wait_hours = config.GPT_BATCH_MAX_WAIT_HOURS
+    
+    elapsed_seconds = 0
+    delay = config.POLL_INITIAL_SEC
+    while True:
+        batch = client.batches.retrieve(batch_id)
+        if batch.status in ("completed", "failed", "expired", "cancelled"):
+            return batch
+        if elapsed_seconds >= max_wait_hours * 3600:
+            print(f"[ERROR] Batch job {batch_id} still {batch.status} after {max_wait_hours} hours")
+            return None
+        print(f"[INFO] Batch job {batch_id} status: {batch.status} ({int(elapsed_seconds) // 60} min)")
+        time.sleep(delay)
+        elapsed_seconds += delay
+        delay = min(config.POLL_MAX_SEC, delay * config.POLL_BACKOFF)
+
+def process_posts_with_batch_api(contents: List[str], batch_size: int = BATCH_SIZE, on_batch=None) -> List[Tuple[str, str, str, str]]:
+    """
+    Label all posts through the OpenAI Batch API: one JSONL line per batch of
+    posts, submitted as a single job and joined back by custom_id.
+    
+    Args:
+        contents: Post texts to label
+        batch_size: Number of posts per request line
+        on_batch: Optional callback on_batch(start, results) for every parsed batch
+    
+    Returns:
+        (summary, cluster1, cluster2, cluster3) per post, in input order
+    """
+    batches = [contents[i:i + batch_size] for i in range(0, len(contents), batch_size)]
+    custom_ids = [hash_text("\n\n".join(batch)) for batch in batches]
+    lines = [
+        json.dumps({
+            "custom_id": custom_id,
+            "method": "POST",
+            "url": "/v1/chat/completions",
+            "body": build_label_request(batch),
+        }, ensure_ascii=False)
+        for custom_id, batch in zip(custom_ids, batches)
+    ]
+    
+    client = get_openai_client()
+    input_file = client.files.create(
+        file=("gpt_labels.jsonl", io.BytesIO("\n".join(lines).encode("utf-8"))),
+        purpose="batch",
+    )
+    job = client.batches.create(
+        input_file_id=input_file.id,
+        endpoint="/v1/chat/completions",
+        completion_window="24h",
+    )
+    print(f"[INFO] Submitted batch job {job.id} with {len(lines)} requests ({len(contents)} posts)")
+    
+    job = wait_for_batch_job(client, job.id)
+    replies = {}
+    if job is not None and job.output_file_id:
+        for line in client.files.content(job.output_file_id).text.splitlines():
+            if not line.strip():
+                continue
+            record = orjson.loads(line)
+            response = record.get("response") or {}
+            if response.get("status_code") == 200:
+                replies[record["custom_id"]] = response["body"]["choices"][0]["message"]["content"] or ""
+    if job is None or job.status != "completed":
+        print(f"[ERROR] Batch job did not complete (status: {job.status if job else 'timeout'})")
+    
+    results = []
+    for custom_id, batch in zip(custom_ids, batches):
+        try:
+            batch_results = parse_label_reply(replies[custom_id], len(batch))
+        except Exception as e:
+            print(f"[ERROR] GPT labeling failed for a batch of {len(batch)} posts: {e!r}")
+            batch_results = failed_labels(len(batch))
+        if on_batch is not None:
+            on_batch(len(results), batch_results)
+        results.extend(batch_results)
+    return results
+
+# ----------------------------
+# Label cache
+# ----------------------------
+def empty_labels() -> pd.DataFrame:
+    """Label frame with no rows, indexed by content hash."""
+    return pd.DataFrame(columns=LABEL_COLUMNS, index=pd.Index([], name="hash"))
+
+def load_label_checkpoint(path: str = None) -> pd.DataFrame:
+    """
+    Load labels checkpointed by a run that did not finish.
+    
+    Args:
+        path: Path to the checkpoint file (uses config.GPT_LABEL_CHECKPOINT_JSONL if None)
+    
+    Returns:
+        DataFrame with the label columns indexed by content hash, empty if there is no checkpoint
+    """
+    path = path or config.GPT_LABEL_CHECKPOINT_JSONL
+    if not path or not os.path.exists(path):
+        return empty_labels()
+    records = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = orjson.loads(line)
+            except orjson.JSONDecodeError:
+                continue  # line cut short by a crash
+            records.append((record["h"], record["s"], record["c1"], record["c2"], record["c3"]))
+    if records:
+        print(f"[INFO] Resuming {len(records)} labels from checkpoint {path}")
+    return pd.DataFrame.from_records(records, columns=["hash"] + LABEL_COLUMNS, index="hash")
+
+def open_label_checkpoint(path: str = None):
+    """Open the checkpoint file for appending, or return None when checkpointing is disabled."""
+    path = path or config.GPT_LABEL_CHECKPOINT_JSONL
+    if not path:
+        return None
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    return open(path, "a", encoding="utf-8")
+
+def write_label_checkpoint(f, hashes: List[str], results: List[Tuple[str, str, str, str]]) -> None:
+    """Append the successful labels of one finished batch to the checkpoint file."""
+    for h, (summary, cluster1, cluster2, cluster3) in zip(hashes, results):
+        if cluster1 != "NONE":
+            f.write(json.dumps({"h": h, "s": summary, "c1": cluster1, "c2": cluster2, "c3": cluster3}, ensure_ascii=False) + "\n")
+    f.flush()
+
+def load_label_cache(path: str = None) -> pd.DataFrame:
+    """
+    Load previously generated labels, indexed by the hash_text of LABEL_CACHE_VERSION
+    and the post content (labels from another model, prompt or taxonomy never match).
+    Labels checkpointed by an interrupted run are included.
+    
+    Args:
+        path: Path to the cache file (uses config.GPT_LABEL_CACHE_PARQUET if None)
+    
+    Returns:
+        DataFrame with the label columns, empty if there is no cache yet
+    """
+    path = path or config.GPT_LABEL_CACHE_PARQUET
+    cache = empty_labels()
+    if path and os.path.exists(path):
+        try:
+            cache = pd.read_parquet(path, engine="pyarrow").set_index("hash")[LABEL_COLUMNS]
+        except Exception as e:
+            print(f"[WARNING] Could not read label cache {path}, ignoring it: {e}")
+    checkpoint = load_label_checkpoint()
+    if checkpoint.empty:
+        return cache
+    cache = pd.concat([cache, checkpoint])
+    return cache[~cache.index.duplicated(keep="last")]
+
+def save_label_cache(cache: pd.DataFrame, path: str = None) -> bool:
+    """
+    Save the label cache. Failures are reported but not raised.
+    
+    Args:
+        cache: DataFrame with the label columns, indexed by content hash
+        path: Path to the cache file (uses config.GPT_LABEL_CACHE_PARQUET if None)
+    
+    Returns:
+        True if the cache was written
+    """
+    path = path or config.GPT_LABEL_CACHE_PARQUET
+    if not path:
+        return False
+    try:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        cache.astype("string").rename_axis("hash").reset_index().to_parquet(
+            path, engine="pyarrow", compression="zstd", index=False
+        )
+        return True
+    except Exception as e:
+        print(f"[WARNING] Could not save label cache {path}: {e}")
+        return False
 
 # ----------------------------
 # Main processing functions
 # ----------------------------
-def label_posts_with_gpt(df: pd.DataFrame, max_workers: int = MAX_WORKERS) -> pd.DataFrame:
+def label_posts_with_gpt(df: pd.DataFrame, max_workers: int = MAX_WORKERS, batch_size: int = BATCH_SIZE,
+                         use_batch_api: bool = None) -> pd.DataFrame:
     """
     Add GPT-generated summaries and clusters to a DataFrame of social media posts.
     
     Args:
         df: DataFrame with social media post data
-        max_workers: Number of parallel workers for GPT API calls
+        max_workers: Maximum number of concurrent GPT API calls
+        batch_size: Number of posts sent per GPT request
+        use_batch_api: Label via the OpenAI Batch API (uses config.USE_BATCH_API if None)
     
     Returns:
         DataFrame with added summary and cluster columns
@@ -230,7 +627,7 @@ def label_posts_with_gpt(df: pd.DataFrame, max_workers: int = MAX_WORKERS) -> pd
     
     # Clean and prepare data
     df = df.copy()
-    df[COL_CONTENT] = df[COL_CONTENT].map(lambda x: compact_text(x if isinstance(x, str) else ""))
+    df[COL_CONTENT] = compact_series(df[COL_CONTENT])
     
     # Remove empty texts
     df = df[df[COL_CONTENT].str.len() > 0].reset_index(drop=True)
@@ -239,46 +636,72 @@ def label_posts_with_gpt(df: pd.DataFrame, max_workers: int = MAX_WORKERS) -> pd
         print("[WARNING] No valid post content found for GPT labeling")
         return df
     
-    # Deduplicate based on normalized text
-    df["__norm__"] = df[COL_CONTENT].map(lambda s: normalize_text(s).lower())
-    df = df.drop_duplicates(subset=["__norm__"], keep="first").reset_index(drop=True)
-    
-    contents = df[COL_CONTENT].tolist()
-    print(f"[INFO] Processing {len(contents)} unique posts with GPT...")
-    
-    # Initialize result columns
-    summaries = [None] * len(contents)
-    cluster1_list = [None] * len(contents)
-    cluster2_list = [None] * len(contents)
-    cluster3_list = [None] * len(contents)
-    
-    # Parallel processing
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        futures = {executor.submit(process_post_with_gpt, content): i for i, content in enumerate(contents)}
-        
-        for future in tqdm(as_completed(futures), total=len(futures), desc="GPT Labeling"):
-            i = futures[future]
-            try:
-                summary, cluster1, cluster2, cluster3 = future.result()
-                summaries[i] = summary
-                cluster1_list[i] = cluster1
-                cluster2_list[i] = cluster2
-                cluster3_list[i] = cluster3
-            except Exception as e:
-                print(f"[ERROR] Failed to process post {i}: {e}")
-                summaries[i] = "NONE"
-                cluster1_list[i] = "NONE"
-                cluster2_list[i] = None
-                cluster3_list[i] = None
-    
-    # Add results to DataFrame
-    df[COL_SUMMARY] = summaries
-    df[COL_CLUSTER_1] = cluster1_list
-    df[COL_CLUSTER_2] = cluster2_list
-    df[COL_CLUSTER_3] = cluster3_list
-    
-    # Clean up temporary column
-    df = df.drop(columns=["__norm__"])
+    # Key every post by its normalized text (and the cache version): duplicates are
+    # labeled once and the labels broadcast back to every row (content is already
+    # normalized, so lower-casing is all that is left to do)
+    df["__hash__"] = (LABEL_CACHE_VERSION + "\n" + df[COL_CONTENT].str.lower()).map(hash_text)
+    
+    # Boilerplate one-liners and posts below the engagement threshold are not worth a GPT call
+    worth_labeling = df[COL_CONTENT].str.len() >= config.MIN_CONTENT_CHARS
+    if "total_engagement" in df.columns:
+        engagement = pd.to_numeric(df["total_engagement"], errors="coerce").fillna(0)
+        worth_labeling &= engagement >= config.MIN_ENGAGEMENT_FOR_LABEL
+    unique = df[worth_labeling].drop_duplicates(subset=["__hash__"], keep="first")[["__hash__", COL_CONTENT]]
+    
+    # Posts whose content was labeled on an earlier run are taken from the cache
+    cache = load_label_cache()
+    is_cached = unique["__hash__"].isin(cache.index)
+    
+    # Only the prompt text is cut to the token budget; stored content and cache keys are unchanged
+    contents = truncate_to_tokens(unique.loc[~is_cached, COL_CONTENT].tolist())
+    print(f"[INFO] {len(unique)} unique posts worth labeling among {len(df)} rows, {int(is_cached.sum())} found in the label cache")
+    print(f"[INFO] Processing {len(contents)} unique posts with GPT in batches of {batch_size}...")
+    
+    if use_batch_api is None:
+        use_batch_api = config.USE_BATCH_API
+    
+    # Batched processing (errors are handled per batch and come back as "NONE").
+    # Finished batches are appended to a checkpoint, so a crash does not lose them.
+    pending_hashes = unique.loc[~is_cached, "__hash__"].tolist()
+    checkpoint = open_label_checkpoint() if contents else None
+    
+    def on_batch(start, batch_results):
+        if checkpoint is not None:
+            write_label_checkpoint(checkpoint, pending_hashes[start:start + len(batch_results)], batch_results)
+    
+    try:
+        if not contents:
+            results = []
+        elif use_batch_api:
+            results = process_posts_with_batch_api(contents, batch_size, on_batch)
+        else:
+            results = asyncio.run(process_posts_with_gpt(contents, max_workers, batch_size, on_batch))
+    finally:
+        if checkpoint is not None:
+            checkpoint.close()
+    new_labels = pd.DataFrame(results, columns=LABEL_COLUMNS, index=pd.Index(pending_hashes, name="hash"))
+    
+    # Remember successful labels (failed calls come back as cluster NONE and are retried next run),
+    # then fold the checkpoint into the cache
+    succeeded = new_labels[new_labels[COL_CLUSTER_1] != "NONE"]
+    checkpoint_path = config.GPT_LABEL_CHECKPOINT_JSONL
+    has_checkpoint = bool(checkpoint_path) and os.path.exists(checkpoint_path)
+    if not succeeded.empty or has_checkpoint:
+        if save_label_cache(pd.concat([cache, succeeded])) and has_checkpoint:
+            os.remove(checkpoint_path)
+    
+    # Add results to DataFrame in one join on the content hash (every row, duplicates
+    # included); skipped posts get OTHER and no summary (NA). Cluster names come from
+    # a fixed taxonomy, so they are stored as categoricals.
+    labels = pd.concat([cache, new_labels])
+    labels = labels.astype({col: "category" for col in [COL_CLUSTER_1, COL_CLUSTER_2, COL_CLUSTER_3]})
+    df = df.drop(columns=LABEL_COLUMNS, errors="ignore").join(labels, on="__hash__")
+    df[COL_CLUSTER_1] = df[COL_CLUSTER_1].cat.add_categories(
+        [name for name in ["OTHER"] if name not in df[COL_CLUSTER_1].cat.categories]
+    ).fillna("OTHER")
+    
+    # Clean up temporary columns
+    df = df.drop(columns=["__hash__"])
     
     print(f"[DONE] GPT labeling completed for {len(df)} posts")
     return df
@@ -288,16 +711,13 @@ def get_cluster_stats(df: pd.DataFrame) -> Dict[str, int]:
     if COL_CLUSTER_1 not in df.columns:
         return {}
     
-    cluster_counts = {}
-    
-    # Count all clusters from all three columns
-    for col in [COL_CLUSTER_1, COL_CLUSTER_2, COL_CLUSTER_3]:
-        if col in df.columns:
-            for cluster in df[col]:
-                if cluster and cluster != "NONE" and pd.notna(cluster):
-                    cluster_counts[cluster] = cluster_counts.get(cluster, 0) + 1
-    
-    return dict(sorted(cluster_counts.items(), key=lambda x: x[1], reverse=True))
+    # Count all clusters from all three columns (value_counts sorts by count)
+    clusters = pd.concat(
+        [df[col] for col in [COL_CLUSTER_1, COL_CLUSTER_2, COL_CLUSTER_3] if col in df.columns],
+        ignore_index=True,
+    )
+    clusters = clusters[clusters.notna() & (clusters != "") & (clusters != "NONE")]
+    return {cluster: int(count) for cluster, count in clusters.value_counts().items()}
 
 def print_cluster_stats(df: pd.DataFrame):
     """Print cluster statistics."""
@@ -9,16 +9,19 @@ from pathlib import Path
 import pandas as pd
 from datetime import datetime, timedelta
 import config
-from scraper import scrape_all_social_media, scrape_facebook_posts
-from transform import process_social_media_data
-from storage import merge_with_existing_data, save_with_backup, print_data_summary
-from gpt_labeler import label_posts_with_gpt, print_cluster_stats
-from summary_generator import generate_all_summaries
+from storage import merge_with_existing_data, save_with_backup, print_data_summary, load_master_data, master_data_exists
+
+# scraper, transform, gpt_labeler and summary_generator (requests, openai, tiktoken, ...)
+# are imported inside the commands that use them, so `status` starts quickly
 
 def main():
     """
     Main pipeline function for social media intelligence
     """
+    from scraper import scrape_all_social_media
+    from transform import process_social_media_data
+    from gpt_labeler import label_posts_with_gpt, print_cluster_stats
+    
     print("🚀 Starting Social Media Intelligence Pipeline")
     print("=" * 60)
     
@@ -65,7 +68,7 @@ def main():
         
         # Step 4: Merge with existing data and deduplicate
         print("\n💾 Step 4: Merging with existing data...")
-        master_path = Path(config.MASTER_XLSX)
+        master_path = Path(config.MASTER_PARQUET)
         combined_df = merge_with_existing_data(df, master_path)
         
         # Step 5: Save updated data
@@ -76,6 +79,7 @@ def main():
         if config.ENABLE_WEEKLY_SUMMARIES:
             print("\n📝 Step 6: Generating weekly summaries...")
             try:
+                from summary_generator import generate_all_summaries
                 summary_path = generate_all_summaries()
                 print(f"✅ Weekly summaries generated: {summary_path}")
             except Exception as e:
@@ -96,6 +100,9 @@ def scrape_facebook_only():
     """
     Scrape Facebook posts only
     """
+    from scraper import scrape_facebook_posts
+    from transform import process_social_media_data
+    
     print("📘 Scraping Facebook posts only...")
     
     if not config.BRIGHTDATA_API_TOKEN:
@@ -105,7 +112,7 @@ def scrape_facebook_only():
     
     if posts:
         df = process_social_media_data(posts)
-        master_path = Path(config.MASTER_XLSX)
+        master_path = Path(config.MASTER_PARQUET)
         combined_df = merge_with_existing_data(df, master_path)
         save_with_backup(combined_df, master_path)
         print_data_summary(combined_df)
@@ -116,6 +123,9 @@ def continue_from_snapshot(snapshot_id):
     """
     Continue pipeline from existing Bright Data snapshot
     """
+    from transform import process_social_media_data
+    from gpt_labeler import label_posts_with_gpt, print_cluster_stats
+    
     print(f"📥 Continuing pipeline from snapshot: {snapshot_id}")
     
     if not config.BRIGHTDATA_API_TOKEN:
@@ -174,7 +184,7 @@ def continue_from_snapshot(snapshot_id):
         
         # Step 4: Merge with existing data and deduplicate
         print("\n💾 Step 4: Merging with existing data...")
-        master_path = Path(config.MASTER_XLSX)
+        master_path = Path(config.MASTER_PARQUET)
         combined_df = merge_with_existing_data(df, master_path)
         
         # Step 5: Save updated data
@@ -185,6 +195,7 @@ def continue_from_snapshot(snapshot_id):
         if config.ENABLE_WEEKLY_SUMMARIES:
             print("\n📝 Step 6: Generating summaries...")
             try:
+                from summary_generator import generate_all_summaries
                 summary_path = generate_all_summaries()
                 print(f"✅ Summaries generated: {summary_path}")
             except Exception as e:
@@ -206,15 +217,17 @@ def process_existing_data():
     """
     Process existing data without scraping (useful for re-running GPT labeling)
     """
+    from gpt_labeler import label_posts_with_gpt, print_cluster_stats
+    
     print("🔄 Processing existing data...")
     
-    master_path = Path(config.MASTER_XLSX)
-    if not master_path.exists():
+    master_path = Path(config.MASTER_PARQUET)
+    if not master_data_exists(master_path):
         print("❌ No existing data file found")
         return
     
-    # Load existing data
-    df = pd.read_excel(master_path)
+    # Load existing data (Parquet, or the xlsx it is first built from)
+    df = load_master_data(master_path)
     print(f"📂 Loaded {len(df)} existing posts")
     
     # Apply GPT labeling if enabled
@@ -233,6 +246,7 @@ def process_existing_data():
     if config.ENABLE_WEEKLY_SUMMARIES:
         print("📝 Generating summaries...")
         try:
+            from summary_generator import generate_all_summaries
             summary_path = generate_all_summaries()
             print(f"✅ Summaries generated: {summary_path}")
         except Exception as e:
@@ -246,6 +260,7 @@ def generate_summaries_only():
     
     if config.ENABLE_WEEKLY_SUMMARIES:
         try:
+            from summary_generator import generate_all_summaries
             summary_path = generate_all_summaries()
             print(f"✅ Summaries generated: {summary_path}")
         except Exception as e:
@@ -274,11 +289,11 @@ def get_pipeline_status():
     
     # Check data files
     print(f"\n📁 Data Files:")
-    master_path = Path(config.MASTER_XLSX)
-    summaries_path = Path(config.SUMMARIES_XLSX)
+    master_path = Path(config.MASTER_PARQUET)
+    summaries_path = Path(config.SUMMARIES_PARQUET)
     
-    if master_path.exists():
-        df = pd.read_excel(master_path)
+    if master_data_exists(master_path):
+        df = load_master_data(master_path, columns=["created_date"])
         print(f"  - Master data: ✅ {len(df)} posts")
         if 'created_date' in df.columns:
             dates = pd.to_datetime(df['created_date'], errors='coerce').dropna()
@@ -288,7 +303,7 @@ def get_pipeline_status():
     else:
         print(f"  - Master data: ❌ Not found")
     
-    if summaries_path.exists():
+    if master_data_exists(summaries_path):
         print(f"  - Summaries: ✅ Available")
     else:
         print(f"  - Summaries: ❌ Not found")
@@ -301,6 +316,11 @@ def get_pipeline_status():
 if __name__ == "__main__":
     import sys
     
+    if "--no-cache" in sys.argv:
+        sys.argv.remove("--no-cache")
+        config.USE_EXCEL_CACHE = False
+        config.USE_SUMMARY_CACHE = False
+    
     if len(sys.argv) > 1:
         command = sys.argv[1].lower()
         
@@ -317,7 +337,7 @@ if __name__ == "__main__":
             continue_from_snapshot(snapshot_id)
         else:
             print(f"❌ Unknown command: {command}")
-            print("Available commands: facebook, process, summaries, status, snapshot <snapshot_id>")
+            print("Available commands: facebook, process, summaries, status, snapshot <snapshot_id> (add --no-cache to bypass the Excel input and summary caches)")
     else:
         # Run full pipeline
         main()
\ No newline at end of file
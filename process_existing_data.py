@@ -6,11 +6,40 @@ Creates a master file from Facebook and LinkedIn data for the first 14 days of A
 
 import pandas as pd
 import numpy as np
-from datetime import datetime, timedelta
+import functools
+import itertools
+import openpyxl
+from types import MappingProxyType
 from pathlib import Path
 import config
 from transform import process_social_media_data
-from storage import save_with_backup, print_data_summary
+from storage import save_with_backup, print_data_summary, read_excel_cached
+
+try:
+    import ciso8601  # C parser for ISO 8601 variants pandas rejects (week/ordinal dates)
+except ImportError:
+    ciso8601 = None
+
+# Rows per chunk when streaming the LinkedIn export
+LINKEDIN_CHUNK_ROWS = 10_000
+
+# LinkedIn export layout, fixed at import: (post column, export column) in
+# output order, engagement metrics summed into total_engagement, and extra
+# metrics copied through when the export has them
+LINKEDIN_POST_COLUMNS = (
+    ('post_id', 'id'),
+    ('created_date', 'date_posted'),
+    ('content', 'post_text'),
+    ('brand', 'user_id'),
+    ('url', 'url'),
+)
+LINKEDIN_ENGAGEMENT_COLUMNS = ('likes', 'comments', 'shares')
+LINKEDIN_EXTRA_ENGAGEMENT_COLUMNS = ('reactions', 'engagement')
+
+def _read_excel_fast(path):
+    """Read a whole export workbook with calamine when available (openpyxl otherwise),
+    through the content-hash Parquet cache"""
+    return read_excel_cached(path)
 
 def process_facebook_data():
     """Process Facebook posts data"""
@@ -18,7 +47,7 @@ def process_facebook_data():
     
     try:
         # Read Facebook data
-        fb_df = pd.read_excel('data/facebook_posts.xlsx')
+        fb_df = _read_excel_fast('data/facebook_posts.xlsx')
         print(f"📊 Facebook data shape: {fb_df.shape}")
         print(f"📊 Facebook columns: {list(fb_df.columns)}")
         
@@ -36,48 +65,75 @@ def process_facebook_data():
         print(f"❌ Error processing Facebook data: {e}")
         return []
 
+def _iter_excel_chunks(path, chunk_rows):
+    """Stream the first sheet of a workbook as DataFrames of up to chunk_rows rows"""
+    # read_only mode streams rows from the sheet XML instead of building the workbook in memory
+    wb = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = wb.active.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        while chunk := list(itertools.islice(rows, chunk_rows)):
+            # Keep cell values as-is (no per-chunk dtype inference, so e.g. ids
+            # format the same in every chunk); empty cells become NaN
+            yield pd.DataFrame(chunk, columns=header, dtype=object).fillna(np.nan)
+    finally:
+        wb.close()
+
+def _linkedin_posts_frame(li_df):
+    """Project one chunk of the LinkedIn export onto the post columns"""
+    # Convert to our expected format in one columnar pass (no per-row Series)
+    def text_column(col):
+        if col not in li_df.columns:
+            return ''
+        return li_df[col].to_numpy().astype(str)
+    
+    # Engagement metrics as int64 arrays; missing columns (LinkedIn data might
+    # not have them) are a scalar 0 that assign broadcasts, unparseable values count as 0
+    def engagement_column(col):
+        if col not in li_df.columns:
+            return 0
+        values = pd.to_numeric(li_df[col], errors='coerce').to_numpy(dtype=np.float64)
+        return np.nan_to_num(values, nan=0, posinf=0, neginf=0).astype(np.int64)
+    
+    columns = {'platform': 'linkedin'}
+    for post_col, export_col in LINKEDIN_POST_COLUMNS:
+        if post_col == 'created_date':
+            # Dates are passed through as read (parsed later by filter_august_data)
+            columns[post_col] = li_df[export_col] if export_col in li_df.columns else ''
+        else:
+            columns[post_col] = text_column(export_col)
+    
+    engagement = {col: engagement_column(col) for col in LINKEDIN_ENGAGEMENT_COLUMNS}
+    extra_engagement = {col: engagement_column(col) for col in LINKEDIN_EXTRA_ENGAGEMENT_COLUMNS if col in li_df.columns}
+    
+    return pd.DataFrame(columns, index=li_df.index).assign(
+        **engagement,
+        total_engagement=sum(engagement.values()),
+        source_url=lambda df: df['url'],
+        **extra_engagement,
+    )
+
 def process_linkedin_data():
     """Process LinkedIn posts data"""
     print("💼 Processing LinkedIn data...")
     
     try:
-        # Read LinkedIn data
-        li_df = pd.read_excel('data/linkedin_posts.xlsx')
-        print(f"📊 LinkedIn data shape: {li_df.shape}")
-        
-        # Convert to our expected format
-        posts = []
-        
-        for _, row in li_df.iterrows():
-            # Extract relevant fields
-            post = {
-                'platform': 'linkedin',
-                'post_id': str(row.get('id', '')),
-                'created_date': row.get('date_posted', ''),
-                'content': str(row.get('post_text', '')),
-                'brand': str(row.get('user_id', '')),
-                'url': str(row.get('url', '')),
-                'likes': 0,  # LinkedIn data might not have engagement metrics
-                'comments': 0,
-                'shares': 0,
-                'total_engagement': 0,
-                'source_url': str(row.get('url', ''))
-            }
-            
-            # Try to extract engagement metrics if available
-            engagement_cols = ['likes', 'comments', 'shares', 'reactions', 'engagement']
-            for col in engagement_cols:
-                if col in row and pd.notna(row[col]):
-                    try:
-                        post[col] = int(row[col])
-                    except (ValueError, TypeError):
-                        post[col] = 0
-            
-            # Calculate total engagement
-            post['total_engagement'] = post.get('likes', 0) + post.get('comments', 0) + post.get('shares', 0)
-            
-            posts.append(post)
+        # Read LinkedIn data in chunks so peak memory is bounded by the chunk size,
+        # not the export size; only the projected post columns are kept per chunk
+        chunks = [
+            _linkedin_posts_frame(li_df)
+            for li_df in _iter_excel_chunks('data/linkedin_posts.xlsx', LINKEDIN_CHUNK_ROWS)
+        ]
+        if not chunks:
+            print("📊 LinkedIn data: no rows")
+            return []
+        posts = pd.concat(chunks, ignore_index=True)
+        print(f"📊 LinkedIn data: {len(posts)} rows read in {len(chunks)} chunks")
         
+        # Post dicts, like the other sources (filtering and flattening take lists of posts)
+        posts = posts.to_dict(orient='records')
         print(f"✅ Processed {len(posts)} LinkedIn posts")
         return posts
         
@@ -85,63 +141,71 @@ def process_linkedin_data():
         print(f"❌ Error processing LinkedIn data: {e}")
         return []
 
+def _parse_iso_date(value):
+    """Parse one ISO 8601 string with ciso8601, NaT if it is not valid ISO"""
+    try:
+        return pd.Timestamp(ciso8601.parse_datetime(str(value)))
+    except (ValueError, TypeError):
+        return pd.NaT
+
 def filter_august_data(posts, days=14):
     """Filter posts to first 14 days of August 2025"""
     print(f"📅 Filtering to first {days} days of August 2025...")
     
-    # Define August 1-14, 2025
-    august_start = datetime(2025, 8, 1)
-    august_end = august_start + timedelta(days=days-1)
+    # Define August 1-14, 2025 (end is exclusive: midnight after the last day)
+    august_start = pd.Timestamp(2025, 8, 1, tz='UTC')
+    august_end = august_start + pd.Timedelta(days=days)
     
-    filtered_posts = []
+    # Parse all dates in one pass; ISO strings (2025-08-21T07:17:37.528Z) and
+    # other formats are handled by format='mixed', naive dates are taken as UTC
+    dates = pd.Series([post.get('created_date', '') for post in posts], dtype=object)
+    has_date = dates.notna() & (dates != '')
+    parsed = pd.to_datetime(dates.where(has_date), errors='coerce', utc=True, format='mixed')
     
-    for post in posts:
-        try:
-            # Parse the date
-            date_str = post.get('created_date', '')
-            if not date_str:
-                continue
-                
-            # Handle different date formats
-            if 'T' in date_str:
-                # ISO format: 2025-08-21T07:17:37.528Z
-                post_date = datetime.fromisoformat(date_str.replace('Z', '+00:00')).date()
-            else:
-                # Try other formats
-                post_date = pd.to_datetime(date_str).date()
-            
-            # Check if it's in our date range
-            if august_start.date() <= post_date <= august_end.date():
-                filtered_posts.append(post)
-                
-        except Exception as e:
-            print(f"⚠️ Error parsing date '{date_str}': {e}")
-            continue
+    unparsed = has_date & parsed.isna()
+    if unparsed.any() and ciso8601 is not None:
+        # Retry only the leftovers with ciso8601
+        retried = [_parse_iso_date(value) for value in dates[unparsed]]
+        parsed[unparsed] = pd.to_datetime(pd.Series(retried, index=dates.index[unparsed], dtype=object), utc=True)
+        unparsed = has_date & parsed.isna()
+    if unparsed.any():
+        print(f"⚠️ Could not parse {int(unparsed.sum())} dates, e.g. '{dates[unparsed].iloc[0]}'")
+    
+    # Check if it's in our date range: compare the raw int64 ticks against the two
+    # bounds converted once to the parsed resolution (NaT is the int64 minimum, so
+    # unparsed dates fall below the start)
+    ticks = parsed.array.asi8
+    start_tick, end_tick = pd.DatetimeIndex([august_start, august_end]).as_unit(parsed.dt.unit).asi8
+    in_range = (ticks >= start_tick) & (ticks < end_tick)
+    filtered_posts = [posts[i] for i in np.flatnonzero(in_range)]
     
     print(f"✅ Filtered to {len(filtered_posts)} posts from August 1-{days}, 2025")
     return filtered_posts
 
+# Brand name mappings (lowercased export handle -> brand name used in the master file),
+# read-only so the cached normalization below can never go stale
+BRAND_MAPPINGS = MappingProxyType({
+    'panorama-lt': 'PANORAMA',
+    'akropolis-group': 'AKROPOLIS | Vilnius',
+    'maxima-lietuva': 'Maxima LT',
+    'lidl-lietuva': 'Lidl Lietuva',
+    'rimi-lietuva': 'Rimi Lietuva',
+    'iki-lietuva': 'IKI'
+})
+
+@functools.lru_cache(maxsize=4096)
+def _normalize_brand(raw_brand):
+    """Normalize one raw brand value (cached: only a handful of distinct brands)"""
+    brand = raw_brand.lower()
+    # Unknown brands: try to clean up the brand name
+    return BRAND_MAPPINGS.get(brand) or brand.replace('-', ' ').replace('_', ' ').title()
+
 def normalize_posts_brand_names(posts):
     """Normalize brand names to match expected format"""
     print("🏷️ Normalizing brand names...")
     
-    # Brand name mappings
-    brand_mappings = {
-        'panorama-lt': 'PANORAMA',
-        'akropolis-group': 'AKROPOLIS | Vilnius',
-        'maxima-lietuva': 'Maxima LT',
-        'lidl-lietuva': 'Lidl Lietuva',
-        'rimi-lietuva': 'Rimi Lietuva',
-        'iki-lietuva': 'IKI'
-    }
-    
     for post in posts:
-        brand = post.get('brand', '').lower()
-        if brand in brand_mappings:
-            post['brand'] = brand_mappings[brand]
-        else:
-            # Try to clean up the brand name
-            post['brand'] = brand.replace('-', ' ').replace('_', ' ').title()
+        post['brand'] = _normalize_brand(post.get('brand') or '')
     
     return posts
 
@@ -6,20 +6,41 @@ Scrapes Facebook posts from company pages
 
 import requests
 import time
+import functools
+import orjson
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from urllib3.util.request import ACCEPT_ENCODING
 import pandas as pd
 import os
 import ast
+import re
+from collections import defaultdict
 from datetime import datetime, timedelta
 from typing import List, Dict, Tuple
 import config
 
 # === Utility Functions ===
+# Supported platforms as one alternation (add e.g. "|linkedin" when a dataset exists for it)
+_PLATFORM_RE = re.compile(r"(facebook)\.com", re.IGNORECASE)
+
 def determine_platform(url: str) -> str:
     """Determine platform from URL"""
-    if "facebook.com" in url:
-        return "facebook"
-    else:
+    match = _PLATFORM_RE.search(url)
+    if match is None:
         raise ValueError(f"Unsupported URL format: {url}")
+    return match.group(1).lower()
+
+def group_urls_by_platform(urls: List[str]) -> Dict[str, List[str]]:
+    """Classify URLs in one pass: platform -> URLs (unsupported URLs are skipped)"""
+    grouped = defaultdict(list)
+    for url in urls:
+        match = _PLATFORM_RE.search(url)
+        if match is not None:
+            grouped[match.group(1).lower()].append(url)
+    return grouped
 
 def format_brightdata_dates(platform: str, date_obj) -> str:
     """Format dates for Bright Data API based on platform"""
@@ -39,10 +60,35 @@ def get_date_range(days_back: int = None) -> Tuple[datetime, datetime]:
     return start_date, end_date
 
 # === Bright Data API Functions ===
+@functools.lru_cache(maxsize=1)
+def get_brightdata_session() -> requests.Session:
+    """
+    Get the shared Bright Data session
+    
+    Trigger, progress polls and snapshot downloads reuse its pooled
+    keep-alive connections instead of a new TLS handshake per request.
+    Idempotent requests (GET) are retried on 502/503/504 with backoff.
+    Compressed responses are requested in every encoding urllib3 can
+    decode here (gzip/deflate, plus br/zstd when brotli/zstandard are installed).
+    
+    Returns:
+        requests.Session with the API token set
+    """
+    session = requests.Session()
+    retry = Retry(total=5, backoff_factor=1, status_forcelist=[502, 503, 504])
+    session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=10, max_retries=retry))
+    session.headers["Authorization"] = f"Bearer {config.BRIGHTDATA_API_TOKEN}"
+    session.headers["Accept-Encoding"] = ACCEPT_ENCODING
+    return session
+
 def trigger_brightdata_scrape(urls: List[str], start_date_obj=None, end_date_obj=None) -> Dict:
     """
     Trigger Bright Data scraping for Facebook posts
     
+    All URLs of a platform are submitted as one JSON array in a single
+    trigger request, so Bright Data builds one snapshot to poll instead of
+    one per page.
+    
     Args:
         urls: List of company page URLs
         start_date_obj: Start date for scraping
@@ -77,18 +123,16 @@ def trigger_brightdata_scrape(urls: List[str], start_date_obj=None, end_date_obj
             "dataset_id": config.BRIGHTDATA_DATASET_IDS[platform],
             "include_errors": "true"
         }
+        if config.BRIGHTDATA_NOTIFY_URL:
+            params["notify"] = config.BRIGHTDATA_NOTIFY_URL
 
-        headers = {
-            "Authorization": f"Bearer {config.BRIGHTDATA_API_TOKEN}",
-            "Content-Type": "application/json"
-        }
-        
         try:
-            response = requests.post(
+            # Body serialized with orjson (bytes, no stdlib json.dumps round trip)
+            response = get_brightdata_session().post(
                 "https://api.brightdata.com/datasets/v3/trigger",
-                headers=headers,
+                headers={"Content-Type": "application/json"},
                 params=params,
-                json=data,
+                data=orjson.dumps(data),
                 timeout=30
             )
             response.raise_for_status()
@@ -115,21 +159,27 @@ def wait_for_snapshot_ready(snapshot_id: str, max_wait_minutes: int = None) -> b
     if max_wait_minutes is None:
         max_wait_minutes = config.MAX_WAIT_MINUTES
         
-    headers = {"Authorization": f"Bearer {config.BRIGHTDATA_API_TOKEN}"}
+    session = get_brightdata_session()
     progress_url = f"https://api.brightdata.com/datasets/v3/progress/{snapshot_id}"
     elapsed_seconds = 0
+    delay = config.POLL_INITIAL_SEC
+    etag = None
+    snapshot_status = None
 
     print(f"⏳ Waiting for snapshot {snapshot_id} to become ready...")
 
     while True:
         try:
-            response = requests.get(progress_url, headers=headers, timeout=30)
+            # Conditional GET: an unchanged progress document comes back as an empty 304
+            conditional = {"If-None-Match": etag} if etag else None
+            response = session.get(progress_url, headers=conditional, timeout=30)
             response.raise_for_status()
             
-            progress_data = response.json()
-            snapshot_status = progress_data.get("status")
+            if response.status_code != 304:
+                etag = response.headers.get("ETag")
+                snapshot_status = response.json().get("status")
 
-            print(f"🔎 Snapshot {snapshot_id} status: {snapshot_status} (checked at {elapsed_seconds // 60} min {elapsed_seconds % 60} sec)")
+            print(f"🔎 Snapshot {snapshot_id} status: {snapshot_status} (checked at {int(elapsed_seconds) // 60} min {int(elapsed_seconds) % 60} sec)")
 
             if snapshot_status == "ready":
                 print(f"✅ Snapshot {snapshot_id} is now ready for download!")
@@ -139,8 +189,10 @@ def wait_for_snapshot_ready(snapshot_id: str, max_wait_minutes: int = None) -> b
                 print(f"❌ Snapshot {snapshot_id} not ready after {max_wait_minutes} minutes.")
                 return False
 
-            time.sleep(20)
-            elapsed_seconds += 20
+            # Exponential backoff: quick checks for fast snapshots, fewer calls for slow ones
+            time.sleep(delay)
+            elapsed_seconds += delay
+            delay = min(config.POLL_MAX_SEC, delay * config.POLL_BACKOFF)
             
         except requests.exceptions.RequestException as e:
             print(f"❌ Error checking snapshot progress: {e}")
@@ -157,7 +209,7 @@ def download_brightdata_snapshot(snapshot_id: str, max_retries: int = 5) -> List
     Returns:
         List of scraped posts
     """
-    headers = {"Authorization": f"Bearer {config.BRIGHTDATA_API_TOKEN}"}
+    session = get_brightdata_session()
     url = f"https://api.brightdata.com/datasets/v3/snapshot/{snapshot_id}"
     params = {"format": "json"}
 
@@ -165,10 +217,11 @@ def download_brightdata_snapshot(snapshot_id: str, max_retries: int = 5) -> List
     
     for attempt in range(max_retries):
         try:
-            response = requests.get(url, headers=headers, params=params, timeout=60)
+            response = session.get(url, params=params, timeout=60)
             response.raise_for_status()
             
-            data = response.json()
+            # orjson parses the (possibly large) snapshot body several times faster than json
+            data = orjson.loads(response.content)
             
             if not data:
                 print(f"⚠️ Snapshot {snapshot_id} is ready but contains no data.")
@@ -223,7 +276,7 @@ def download_brightdata_snapshot(snapshot_id: str, max_retries: int = 5) -> List
             
             return posts_data
             
-        except requests.exceptions.RequestException as e:
+        except (requests.exceptions.RequestException, orjson.JSONDecodeError) as e:
             if attempt < max_retries - 1:
                 print(f"❌ Error downloading snapshot {snapshot_id} (attempt {attempt + 1}): {e}. Retrying...")
                 time.sleep(10)
@@ -276,19 +329,49 @@ def scrape_platform_posts(platform: str, urls: List[str], start_date=None, end_d
     # Download data
     posts = download_brightdata_snapshot(snapshot_id)
     
-    # Add platform information to each post
+    # Add platform information to each post (one scrape timestamp for the whole snapshot)
+    scraped_at = datetime.now().isoformat()
     processed_posts = []
     for post in posts:
         # Ensure post is a dictionary
         if isinstance(post, dict):
             post['platform'] = platform
-            post['scraped_at'] = datetime.now().isoformat()
+            post['scraped_at'] = scraped_at
             processed_posts.append(post)
         else:
             print(f"⚠️ Warning: Skipping non-dict post: {type(post)}")
     
     return processed_posts
 
+def scrape_platform_posts_batched(platform: str, urls: List[str], start_date=None, end_date=None) -> List[Dict]:
+    """
+    Scrape posts from a platform in batches of config.SCRAPE_BATCH_SIZE URLs
+    
+    Each batch is its own Bright Data snapshot; the batches are triggered,
+    polled and downloaded in parallel threads (the work is waiting on HTTP).
+    
+    Args:
+        platform: Platform name ('facebook')
+        urls: List of URLs to scrape
+        start_date: Start date for scraping
+        end_date: End date for scraping
+    
+    Returns:
+        List of scraped posts from all batches
+    """
+    if not urls:
+        return []
+    
+    batch_size = config.SCRAPE_BATCH_SIZE
+    batches = [urls[i:i + batch_size] for i in range(0, len(urls), batch_size)]
+    if len(batches) == 1:
+        return scrape_platform_posts(platform, urls, start_date, end_date)
+    
+    print(f"🧵 Scraping {len(urls)} {platform} URLs in {len(batches)} parallel batches...")
+    with ThreadPoolExecutor(max_workers=min(config.MAX_WORKERS, len(batches))) as executor:
+        results = executor.map(lambda batch: scrape_platform_posts(platform, batch, start_date, end_date), batches)
+        return list(chain.from_iterable(results))
+
 def scrape_all_social_media(urls: List[str] = None, start_date=None, end_date=None) -> List[Dict]:
     """
     Scrape all social media posts from the configured URLs (Facebook only)
@@ -311,13 +394,13 @@ def scrape_all_social_media(urls: List[str] = None, start_date=None, end_date=No
     print(f"📅 Date range: {start_date.date()} to {end_date.date()}")
     
     # Filter URLs for Facebook only
-    facebook_urls = [url for url in urls if "facebook.com" in url]
+    facebook_urls = group_urls_by_platform(urls)["facebook"]
     
     all_posts = []
     
     # Scrape Facebook posts
     if facebook_urls:
-        facebook_posts = scrape_platform_posts("facebook", facebook_urls, start_date, end_date)
+        facebook_posts = scrape_platform_posts_batched("facebook", facebook_urls, start_date, end_date)
         all_posts.extend(facebook_posts)
         print(f"📘 Facebook: {len(facebook_posts)} posts scraped")
     
@@ -329,8 +412,8 @@ def scrape_facebook_posts(urls: List[str] = None, start_date=None, end_date=None
     if urls is None:
         urls = config.FACEBOOK_URLS
     
-    facebook_urls = [url for url in urls if "facebook.com" in url]
-    return scrape_platform_posts("facebook", facebook_urls, start_date, end_date)
+    facebook_urls = group_urls_by_platform(urls)["facebook"]
+    return scrape_platform_posts_batched("facebook", facebook_urls, start_date, end_date)
 
 
 if __name__ == "__main__":
@@ -350,7 +433,9 @@ if __name__ == "__main__":
         print(f"✅ Test successful: {len(posts)} posts scraped")
         # Save test data
         df = pd.DataFrame(posts)
-        df.to_excel("test_social_media_scraping.xlsx", index=False)
+        # Streamed through storage's write-only workbook rather than pandas' styled writer
+        from storage import save_excel
+        save_excel(df, "test_social_media_scraping.xlsx")
         print("💾 Test data saved to test_social_media_scraping.xlsx")
     else:
         print("❌ Test failed: No posts scraped")
\ No newline at end of file
@@ -4,11 +4,21 @@ Storage functions for social media data
 Handles loading, saving, and deduplication of social media posts
 """
 
+import glob
+import hashlib
+import heapq
+import importlib.util
+import os
+import shutil
+import openpyxl
 import pandas as pd
 from pathlib import Path
 from datetime import datetime
 import config
 
+# Rust-based calamine parses workbooks ~2x faster than openpyxl; fall back if it is not installed
+EXCEL_READ_ENGINE = "calamine" if importlib.util.find_spec("python_calamine") else "openpyxl"
+
 def load_excel(path: Path) -> pd.DataFrame:
     """
     Load data from Excel file, returning empty DataFrame if file doesn't exist.
@@ -21,7 +31,7 @@ def load_excel(path: Path) -> pd.DataFrame:
     """
     if path.exists():
         try:
-            df = pd.read_excel(path, dtype=str)
+            df = pd.read_excel(path, dtype=str, engine=EXCEL_READ_ENGINE)
             print(f"📂 Loaded {len(df)} posts from {path}")
             return df
         except Exception as e:
@@ -33,20 +43,264 @@ def load_excel(path: Path) -> pd.DataFrame:
 
 def save_excel(df: pd.DataFrame, path: Path) -> None:
     """
-    Save DataFrame to Excel file with proper formatting.
+    Save DataFrame to Excel file (values only). Rows are streamed through an
+    openpyxl write-only workbook, which skips pandas' cell styling and keeps
+    memory flat regardless of row count.
     
     Args:
         df: DataFrame to save
         path: Path where to save the Excel file
     """
     try:
+        path = Path(path)
         path.parent.mkdir(parents=True, exist_ok=True)
-        df.to_excel(path, index=False, engine='openpyxl')
+        wb = openpyxl.Workbook(write_only=True)
+        ws = wb.create_sheet()
+        ws.append([str(col) for col in df.columns])
+        # Missing values (NaN/NA/NaT) become empty cells, as with to_excel
+        values = df.astype(object).where(df.notna(), None)
+        for row in values.itertuples(index=False, name=None):
+            ws.append(row)
+        _replace_file(path, wb.save)
         print(f"💾 Saved {len(df)} posts to {path}")
     except Exception as e:
         print(f"❌ Error saving to {path}: {e}")
         raise
 
+# Low-cardinality text columns, written dictionary-encoded (read back as categoricals)
+PARQUET_DICTIONARY_COLUMNS = ["platform", "brand", "cluster_1", "cluster_2", "cluster_3"]
+# zstd level 3 compresses the free-text columns (content, summaries) a bit
+# better than the default at similar read speed; row groups of 50k rows keep
+# column pruning and statistics useful as the master file grows
+PARQUET_ZSTD_LEVEL = 3
+PARQUET_ROW_GROUP_SIZE = 50_000
+# Post metrics, stored as int64 so readers don't have to coerce them
+ENGAGEMENT_COLUMNS = ["likes", "comments", "shares"]
+
+def parquet_path(path: Path) -> Path:
+    """Path of the Parquet file (the canonical copy) for a data file."""
+    return Path(path).with_suffix(".parquet")
+
+def xlsx_path(path: Path) -> Path:
+    """Path of the Excel export (human-facing copy) for a data file."""
+    return Path(path).with_suffix(".xlsx")
+
+def master_data_exists(path: Path) -> bool:
+    """True if a data file exists in either format (Parquet or Excel)."""
+    return parquet_path(path).exists() or xlsx_path(path).exists()
+
+def master_data_mtime(path: Path) -> float:
+    """Latest modification time of a data file's Parquet/Excel copies (0 if neither exists)."""
+    return max((p.stat().st_mtime for p in (parquet_path(path), xlsx_path(path)) if p.exists()), default=0.0)
+
+def _parquet_safe(df: pd.DataFrame) -> pd.DataFrame:
+    """Cast mixed-type object columns to strings so pyarrow can write them."""
+    object_cols = df.select_dtypes(include="object").columns
+    if len(object_cols) == 0:
+        return df
+    return df.astype({col: "string" for col in object_cols})
+
+def _typed_posts(df: pd.DataFrame) -> pd.DataFrame:
+    """Parse a posts table's metric columns to int64 and created_date to datetime64 (other tables pass through)."""
+    if not set(ENGAGEMENT_COLUMNS).issubset(df.columns):
+        return df
+    df = df.assign(**{col: pd.to_numeric(df[col], errors="coerce").fillna(0).astype("int64")
+                      for col in ENGAGEMENT_COLUMNS})
+    if "created_date" in df.columns and not pd.api.types.is_datetime64_any_dtype(df["created_date"]):
+        try:
+            dates = pd.to_datetime(df["created_date"], errors="coerce", format="mixed")
+        except (TypeError, ValueError):
+            # e.g. a mix of timezone-aware and naive timestamps: keep the text as is
+            return df
+        if pd.api.types.is_datetime64_any_dtype(dates):
+            df["created_date"] = dates
+    return df
+
+def _replace_file(path: Path, write) -> None:
+    """
+    Write a file via write(temp_path), then move it over path. The old file
+    is replaced rather than rewritten in place, so readers never see a
+    half-written file and hard-linked backups keep their contents.
+    """
+    tmp_path = path.with_name(path.name + ".tmp")
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        if tmp_path.exists():
+            tmp_path.unlink()
+
+def _write_parquet(df: pd.DataFrame, path: Path) -> None:
+    """Write DataFrame to Parquet (zstd-compressed, dictionary-encoded low-cardinality columns)."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    path.parent.mkdir(parents=True, exist_ok=True)
+    dictionary_cols = [col for col in PARQUET_DICTIONARY_COLUMNS if col in df.columns]
+    df = _parquet_safe(df).astype({col: "category" for col in dictionary_cols})
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    _replace_file(path, lambda tmp_path: pq.write_table(
+        table, tmp_path, compression="zstd", compression_level=PARQUET_ZSTD_LEVEL,
+        use_dictionary=True, row_group_size=PARQUET_ROW_GROUP_SIZE))
+
+def save_parquet(df: pd.DataFrame, path: Path) -> None:
+    """
+    Save DataFrame to Parquet (zstd-compressed, with dictionary encoding for
+    the low-cardinality columns). Failures are reported but not raised; use
+    save_table when the Parquet file is the only copy being written.
+    
+    Args:
+        df: DataFrame to save
+        path: Path where to save the Parquet file
+    """
+    try:
+        _write_parquet(df, path)
+        print(f"💾 Saved {len(df)} rows to {path}")
+    except Exception as e:
+        print(f"⚠️ Failed to save Parquet copy {path}: {e}")
+
+def _read_cached_excel_copy(cache_path: Path) -> pd.DataFrame:
+    """Read a cached workbook copy, with text columns NaN-backed as read_excel returns them."""
+    df = pd.read_parquet(cache_path, engine="pyarrow")
+    text_cols = [col for col in df.columns if isinstance(df[col].dtype, pd.StringDtype)]
+    return df.astype({col: "str" for col in text_cols}) if text_cols else df
+
+def read_excel_cached(path: Path, use_cache: bool = None) -> pd.DataFrame:
+    """
+    Read an Excel file through a Parquet cache keyed by the file's content
+    hash, so an unchanged workbook is parsed only once. The cache lives in
+    config.EXCEL_CACHE_DIR (one entry per file name, older versions are
+    removed); it is bypassed when use_cache is off.
+    
+    Args:
+        path: Path to the Excel file
+        use_cache: Read through the cache (uses config.USE_EXCEL_CACHE if None)
+    
+    Returns:
+        DataFrame with the workbook's first sheet
+    """
+    path = Path(path)
+    if use_cache is None:
+        use_cache = config.USE_EXCEL_CACHE
+    if not use_cache:
+        return pd.read_excel(path, engine=EXCEL_READ_ENGINE)
+    
+    digest = hashlib.blake2b(path.read_bytes(), digest_size=8).hexdigest()
+    cache_dir = Path(config.EXCEL_CACHE_DIR)
+    cache_path = cache_dir / f"{path.stem}-{digest}.parquet"
+    if cache_path.exists():
+        try:
+            return _read_cached_excel_copy(cache_path)
+        except Exception as e:
+            print(f"⚠️ Failed to read cached copy {cache_path}, re-reading {path}: {e}")
+    
+    df = pd.read_excel(path, engine=EXCEL_READ_ENGINE)
+    try:
+        for stale in cache_dir.glob(f"{glob.escape(path.stem)}-*.parquet"):
+            stale.unlink()
+        _write_parquet(df, cache_path)
+        # Return the cached copy so cache hits and misses give the same dtypes
+        return _read_cached_excel_copy(cache_path)
+    except Exception as e:
+        print(f"⚠️ Failed to cache {path}: {e}")
+        return df
+
+def load_table(path: Path, columns: list[str] = None, use_cache: bool = None) -> pd.DataFrame:
+    """
+    Load a data file, picking the reader by suffix (.parquet or .xlsx).
+    
+    Args:
+        path: Path to the Parquet or Excel file
+        columns: Optional list of columns to load (missing ones are skipped)
+        use_cache: Read Excel files through the Parquet cache (uses config.USE_EXCEL_CACHE if None)
+    
+    Returns:
+        DataFrame with the loaded data
+    """
+    path = Path(path)
+    if path.suffix == ".parquet":
+        if columns is not None:
+            import pyarrow.parquet as pq
+            available = set(pq.read_schema(path).names)
+            columns = [col for col in columns if col in available]
+        return pd.read_parquet(path, engine="pyarrow", columns=columns)
+    
+    df = read_excel_cached(path, use_cache=use_cache)
+    if columns is not None:
+        df = df[[col for col in columns if col in df.columns]]
+    return df
+
+def save_table(df: pd.DataFrame, path: Path) -> None:
+    """
+    Save a data file, picking the writer by suffix (.parquet or .xlsx).
+    Errors are raised.
+    
+    Args:
+        df: DataFrame to save
+        path: Path to the Parquet or Excel file
+    """
+    path = Path(path)
+    if path.suffix == ".parquet":
+        try:
+            _write_parquet(df, path)
+            print(f"💾 Saved {len(df)} rows to {path}")
+        except Exception as e:
+            print(f"❌ Error saving to {path}: {e}")
+            raise
+    else:
+        save_excel(df, path)
+
+def load_master_data(path: Path, columns: list[str] = None) -> pd.DataFrame:
+    """
+    Load a data file from its canonical Parquet copy. The Excel file is read
+    instead when there is no (readable) Parquet copy yet, e.g. data committed
+    before the switch to Parquet, or when the Excel file is newer (edited by
+    hand or pulled from the repository); the Parquet copy is then rewritten
+    from it, so later loads skip Excel parsing. Posts tables come back typed:
+    int64 likes, comments and shares and a datetime64 created_date.
+    
+    Args:
+        path: Path to the data file (.parquet or .xlsx, either copy is found)
+        columns: Optional list of columns to load (missing ones are skipped)
+    
+    Returns:
+        DataFrame with the loaded data
+    """
+    pq_path = parquet_path(path)
+    excel_path = xlsx_path(path)
+    # save_master_data writes the Excel export before the Parquet copy, so the
+    # Excel file is only newer if it was changed outside of this code
+    excel_is_newer = excel_path.exists() and (
+        not pq_path.exists() or excel_path.stat().st_mtime > pq_path.stat().st_mtime
+    )
+    if excel_is_newer and pq_path.exists():
+        print(f"📂 {excel_path} is newer than {pq_path}, reloading it")
+    elif pq_path.exists():
+        try:
+            return load_table(pq_path, columns=columns)
+        except Exception as e:
+            print(f"⚠️ Failed to read {pq_path}, falling back to {excel_path}: {e}")
+    
+    df = _typed_posts(pd.read_excel(excel_path, engine=EXCEL_READ_ENGINE))
+    save_parquet(df, pq_path)
+    if columns is not None:
+        df = df[[col for col in columns if col in df.columns]]
+    return df
+
+def save_master_data(df: pd.DataFrame, path: Path) -> None:
+    """
+    Save a data file: Parquet is the canonical copy (posts tables typed as in
+    load_master_data); the Excel export is also written when
+    config.EXPORT_XLSX is set (written first, so the Parquet copy stays the
+    newer one).
+    
+    Args:
+        df: DataFrame to save
+        path: Path to the data file (.parquet or .xlsx, both copies are derived from it)
+    """
+    if config.EXPORT_XLSX:
+        save_excel(df, xlsx_path(path))
+    save_table(_typed_posts(df), parquet_path(path))
+
 def deduplicate_posts(df: pd.DataFrame, keys: list[str] = None) -> pd.DataFrame:
     """
     Remove duplicate social media posts based on specified keys.
@@ -64,18 +318,26 @@ def deduplicate_posts(df: pd.DataFrame, keys: list[str] = None) -> pd.DataFrame:
     if df.empty:
         return df
     
-    df = df.copy()
     original_count = len(df)
     
-    # Ensure all deduplication keys exist and are string type
+    # Deduplication keys as strings (missing keys as empty columns), built
+    # separately so only the key columns are converted, not the whole frame
+    key_columns = {}
     for key in keys:
         if key not in df.columns:
             print(f"⚠️ Warning: Deduplication key '{key}' not found in data, adding as empty column")
-            df[key] = pd.NA
-        df[key] = df[key].astype("string")
-    
-    # Remove duplicates
-    df_deduped = df.drop_duplicates(subset=keys, keep="first")
+            key_columns[key] = pd.Series(pd.NA, index=df.index, dtype="string[pyarrow]")
+        else:
+            key_columns[key] = df[key].astype("string[pyarrow]")
+    key_frame = pd.DataFrame(key_columns)
+    
+    # Remove duplicates: hash the key columns to one uint64 per row so the
+    # duplicate check runs on fixed-width integers instead of Python strings
+    if config.DEDUP_EXACT:
+        keep = ~key_frame.duplicated(keep="first").to_numpy()
+    else:
+        keep = ~pd.util.hash_pandas_object(key_frame, index=False).duplicated(keep="first").to_numpy()
+    df_deduped = df[keep].assign(**{key: key_frame[key][keep] for key in keys})
     
     removed_count = original_count - len(df_deduped)
     if removed_count > 0:
@@ -91,17 +353,21 @@ def merge_with_existing_data(new_posts: pd.DataFrame, existing_path: Path) -> pd
     
     Args:
         new_posts: DataFrame with new posts
-        existing_path: Path to existing Excel file
+        existing_path: Path to the existing data file (Parquet, or its Excel copy)
     
     Returns:
         Combined DataFrame with duplicates removed
     """
+    if not master_data_exists(existing_path):
+        print(f"📂 File {existing_path} does not exist, starting with empty dataset")
+        existing_posts = pd.DataFrame()
+    else:
+        existing_posts = load_master_data(existing_path)
+        print(f"📂 Loaded {len(existing_posts)} posts from {existing_path}")
+    
     if new_posts.empty:
         print("⚠️ No new posts to merge")
-        return load_excel(existing_path)
-    
-    # Load existing data
-    existing_posts = load_excel(existing_path)
+        return existing_posts
     
     if existing_posts.empty:
         print("📝 No existing data found, using new posts only")
@@ -116,9 +382,18 @@ def merge_with_existing_data(new_posts: pd.DataFrame, existing_path: Path) -> pd
     
     return combined_deduped
 
+def _same_content(path: Path, other: Path) -> bool:
+    """True if two files hold the same bytes (sizes compared first, then blake2b digests)."""
+    if path.stat().st_size != other.stat().st_size:
+        return False
+    return hashlib.blake2b(path.read_bytes()).digest() == hashlib.blake2b(other.read_bytes()).digest()
+
 def backup_existing_data(path: Path) -> None:
     """
-    Create a backup of existing data before overwriting.
+    Create a backup of existing data before overwriting. Skipped when the
+    file is unchanged since its latest backup; otherwise the backup is a
+    hard link (no bytes copied; safe because saves replace the file instead
+    of rewriting it), or a copy where linking isn't possible.
     
     Args:
         path: Path to the data file to backup
@@ -126,12 +401,23 @@ def backup_existing_data(path: Path) -> None:
     if not path.exists():
         return
     
+    backup_dir = path.parent / "backups"
+    previous = sorted(backup_dir.glob(f"{glob.escape(path.stem)}_backup_*{path.suffix}"))
+    try:
+        if previous and _same_content(path, previous[-1]):
+            print(f"💾 Backup skipped, {path} unchanged since {previous[-1].name}")
+            return
+    except OSError:
+        pass
+    
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    backup_path = path.parent / "backups" /f"{path.stem}_backup_{timestamp}{path.suffix}"
+    backup_path = backup_dir / f"{path.stem}_backup_{timestamp}{path.suffix}"
     
     try:
-        import shutil
-        shutil.copy2(path, backup_path)
+        try:
+            os.link(path, backup_path)
+        except OSError:
+            shutil.copy2(path, backup_path)
         print(f"💾 Created backup: {backup_path}")
     except Exception as e:
         print(f"⚠️ Failed to create backup: {e}")
@@ -158,18 +444,22 @@ def get_data_summary(df: pd.DataFrame) -> dict:
     summary = {
         "total_posts": len(df),
         "platforms": df['platform'].value_counts().to_dict() if 'platform' in df.columns else {},
-        "brands": df['brand'].value_counts().to_dict() if 'brand' in df.columns else {},
+        # Unsorted counts: only the top 10 are ever ranked (print_data_summary)
+        "brands": df['brand'].value_counts(sort=False).to_dict() if 'brand' in df.columns else {},
     }
     
     # Date range
     if 'created_date' in df.columns:
         try:
-            dates = pd.to_datetime(df['created_date'], errors='coerce')
-            valid_dates = dates.dropna()
-            if not valid_dates.empty:
+            # Typed posts tables already hold datetime64 (no parse); min/max skip NaT
+            dates = df['created_date']
+            if not pd.api.types.is_datetime64_any_dtype(dates):
+                dates = pd.to_datetime(dates, errors='coerce')
+            earliest, latest = dates.min(), dates.max()
+            if pd.notna(earliest):
                 summary["date_range"] = {
-                    "earliest": valid_dates.min().date().isoformat(),
-                    "latest": valid_dates.max().date().isoformat()
+                    "earliest": earliest.date().isoformat(),
+                    "latest": latest.date().isoformat()
                 }
         except Exception:
             summary["date_range"] = None
@@ -211,7 +501,7 @@ def print_data_summary(df: pd.DataFrame) -> None:
     
     if summary['brands']:
         print(f"\nTop 10 brands:")
-        for brand, count in list(summary['brands'].items())[:10]:
+        for brand, count in heapq.nlargest(10, summary['brands'].items(), key=lambda item: item[1]):
             print(f"  {brand}: {count}")
     
     if summary['date_range']:
@@ -230,13 +520,16 @@ def save_with_backup(df: pd.DataFrame, path: Path) -> None:
     
     Args:
         df: DataFrame to save
-        path: Path where to save the data
+        path: Path of the data file (see save_master_data)
     """
-    # Create backup if file exists
-    backup_existing_data(path)
-    
-    # Save new data
-    save_excel(df, path)
+    # Create backups of the copies about to be overwritten (the committed Excel
+    # file too when the export is on; the Parquet copy is not tracked by git)
+    backup_existing_data(parquet_path(path))
+    if config.EXPORT_XLSX:
+        backup_existing_data(xlsx_path(path))
+    
+    # Save new data (Parquet, plus the Excel export when enabled)
+    save_master_data(df, path)
     
     # Print summary
     print_data_summary(df)
@@ -5,15 +5,29 @@ Generates LLM-powered summaries for Akropolis and competitor social media perfor
 """
 
 import os
+import hashlib
+import numpy as np
 import pandas as pd
 from datetime import datetime, timedelta
 from pathlib import Path
-from openai import OpenAI
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import asyncio
+from openai import AsyncOpenAI
 import config
+from storage import load_master_data, master_data_exists, save_master_data
+from gpt_labeler import RequestThrottle, create_completion
 
-# Initialize OpenAI client
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY", config.OPENAI_API_KEY))
+def get_async_openai_client():
+    """OpenAI client for one summaries run (its connections belong to that run's event loop);
+    rate-limit, server and connection errors are retried with exponential backoff"""
+    return AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY", config.OPENAI_API_KEY),
+                       max_retries=config.GPT_MAX_RETRIES)
+
+def summary_cache_path(prompt, model):
+    """Cache file for a prompt's completion (None when config.USE_SUMMARY_CACHE is off)"""
+    if not config.USE_SUMMARY_CACHE:
+        return None
+    key = hashlib.blake2b(f"{model}\n{prompt}".encode("utf-8"), digest_size=16).hexdigest()
+    return Path(config.SUMMARY_CACHE_DIR) / f"{key}.txt"
 
 # Brand groupings (from config)
 AKROPOLIS_LOCATIONS = config.AKROPOLIS_LOCATIONS
@@ -24,23 +38,32 @@ RETAIL = config.RETAIL
 
 ALL_COMPETITORS = BIG_PLAYERS + SMALLER_PLAYERS + OTHER_CITIES + RETAIL
 
+def _rows_between(df, sorted_dates, order, first_day, last_day):
+    """Rows dated first_day..last_day (inclusive), in their original order"""
+    lo, hi = sorted_dates.searchsorted([np.datetime64(first_day), np.datetime64(last_day + timedelta(days=1))])
+    return df.iloc[np.sort(order[lo:hi])].copy()
+
 def load_and_filter_data():
     """Load data from Facebook master file and filter for last 14 days and previous 7 days"""
     # Load Facebook data
-    facebook_df = pd.read_excel(config.FACEBOOK_MASTER_XLSX)
+    facebook_df = load_master_data(Path(config.FACEBOOK_MASTER_PARQUET))
     facebook_df['platform'] = 'facebook'
     
     # Use Facebook data only
     df = facebook_df
     
-    # Parse dates
+    # The master file is stored typed (datetime64 created_date, int64 metrics),
+    # so this is a no-op unless it still predates that
     df["date"] = pd.to_datetime(df["created_date"], errors="coerce")
-    df["likes"] = pd.to_numeric(df["likes"], errors="coerce").fillna(0)
-    df["comments"] = pd.to_numeric(df["comments"], errors="coerce").fillna(0)
-    df["shares"] = pd.to_numeric(df["shares"], errors="coerce").fillna(0)
     
     # Calculate weighted engagement: like=1, comment=3, share=5
-    df["total_engagement"] = (df["likes"] * 1 + df["comments"] * 3 + df["shares"] * 5)
+    # (single eval expression: one fused pass, numexpr-backed when installed)
+    df["total_engagement"] = df.eval("likes + 3 * comments + 5 * shares")
+    
+    # Low-cardinality columns used for grouping/counting: categoricals group on int codes
+    for col in ("brand", "platform", "cluster_1"):
+        if col in df.columns:
+            df[col] = df[col].astype("category")
     
     # Get date ranges - last 14 days
     end_date = datetime.now().date()
@@ -54,40 +77,63 @@ def load_and_filter_data():
     prev_7_days_end = current_7_days_start - timedelta(days=1)
     prev_7_days_start = prev_7_days_end - timedelta(days=6)  # 7 days total
     
-    # Filter data
-    df_14_days = df[
-        (df["date"].dt.date >= start_date) & 
-        (df["date"].dt.date <= end_date)
-    ].copy()
+    # Filter data: sort the dates once, then each period is a searchsorted
+    # slice instead of a per-row .dt.date comparison
+    dates = df["date"].dt.tz_localize(None) if df["date"].dt.tz is not None else df["date"]
+    order = np.argsort(dates.to_numpy(), kind="stable")
+    sorted_dates = dates.to_numpy()[order]
     
-    df_current_week = df[
-        (df["date"].dt.date >= current_7_days_start) & 
-        (df["date"].dt.date <= current_7_days_end)
-    ].copy()
-    
-    df_previous_week = df[
-        (df["date"].dt.date >= prev_7_days_start) & 
-        (df["date"].dt.date <= prev_7_days_end)
-    ].copy()
+    df_14_days = _rows_between(df, sorted_dates, order, start_date, end_date)
+    df_current_week = _rows_between(df, sorted_dates, order, current_7_days_start, current_7_days_end)
+    df_previous_week = _rows_between(df, sorted_dates, order, prev_7_days_start, prev_7_days_end)
     
     return df_14_days, df_current_week, df_previous_week, start_date, end_date
 
-def get_brand_stats(df_current_week, df_previous_week, brand_name):
-    """Get statistics for a specific brand"""
-    current_data = df_current_week[df_current_week["brand"] == brand_name]
-    previous_data = df_previous_week[df_previous_week["brand"] == brand_name]
-    
-    current_posts = current_data["post_id"].nunique()
-    current_engagement = current_data["total_engagement"].sum()
-    current_likes = current_data["likes"].sum()
-    current_comments = current_data["comments"].sum()
-    current_shares = current_data["shares"].sum()
-    
-    previous_posts = previous_data["post_id"].nunique()
-    previous_engagement = previous_data["total_engagement"].sum()
-    previous_likes = previous_data["likes"].sum()
-    previous_comments = previous_data["comments"].sum()
-    previous_shares = previous_data["shares"].sum()
+EMPTY_BRAND_WEEK = {
+    "posts": 0, "engagement": 0, "likes": 0, "comments": 0, "shares": 0,
+    "content": [], "clusters": [], "platforms": {},
+}
+
+def aggregate_brand_weeks(df):
+    """Aggregate one week of posts per brand in a single groupby pass"""
+    if df.empty:
+        return {}
+    by_brand = df.groupby("brand", observed=True, sort=False)
+    stats = by_brand.agg(
+        posts=("post_id", "nunique"),
+        engagement=("total_engagement", "sum"),
+        likes=("likes", "sum"),
+        comments=("comments", "sum"),
+        shares=("shares", "sum"),
+    ).to_dict("index")
+    content = df.dropna(subset=["content"]).groupby("brand", observed=True)["content"].apply(list)
+    clusters = df.dropna(subset=["cluster_1"]).groupby("brand", observed=True)["cluster_1"].apply(list)
+    for brand, brand_stats in stats.items():
+        brand_stats["content"] = content.get(brand, [])
+        brand_stats["clusters"] = clusters.get(brand, [])
+        brand_stats["platforms"] = {}
+    # Platform counts for every brand from one (brand, platform) count, most used first
+    platform_counts = df.groupby(["brand", "platform"], observed=True).size()
+    for (brand, platform), count in platform_counts.sort_values(ascending=False, kind="stable").items():
+        stats[brand]["platforms"][platform] = count
+    return stats
+
+def get_brand_stats(current_by_brand, previous_by_brand, brand_name):
+    """Get statistics for a specific brand from the per-brand weekly aggregates"""
+    current_data = current_by_brand.get(brand_name, EMPTY_BRAND_WEEK)
+    previous_data = previous_by_brand.get(brand_name, EMPTY_BRAND_WEEK)
+    
+    current_posts = current_data["posts"]
+    current_engagement = current_data["engagement"]
+    current_likes = current_data["likes"]
+    current_comments = current_data["comments"]
+    current_shares = current_data["shares"]
+    
+    previous_posts = previous_data["posts"]
+    previous_engagement = previous_data["engagement"]
+    previous_likes = previous_data["likes"]
+    previous_comments = previous_data["comments"]
+    previous_shares = previous_data["shares"]
     
     # Calculate percentage changes
     posts_change = ((current_posts - previous_posts) / previous_posts * 100) if previous_posts > 0 else (100 if current_posts > 0 else 0)
@@ -96,10 +142,6 @@ def get_brand_stats(df_current_week, df_previous_week, brand_name):
     comments_change = ((current_comments - previous_comments) / previous_comments * 100) if previous_comments > 0 else (100 if current_comments > 0 else 0)
     shares_change = ((current_shares - previous_shares) / previous_shares * 100) if previous_shares > 0 else (100 if current_shares > 0 else 0)
     
-    # Get platform breakdown
-    current_platforms = current_data["platform"].value_counts().to_dict()
-    previous_platforms = previous_data["platform"].value_counts().to_dict()
-    
     return {
         "current_posts": current_posts,
         "current_engagement": current_engagement,
@@ -116,19 +158,27 @@ def get_brand_stats(df_current_week, df_previous_week, brand_name):
         "likes_change": likes_change,
         "comments_change": comments_change,
         "shares_change": shares_change,
-        "current_content": current_data["content"].dropna().tolist(),
-        "previous_content": previous_data["content"].dropna().tolist(),
-        "current_clusters": current_data["cluster_1"].dropna().tolist(),
-        "previous_clusters": previous_data["cluster_1"].dropna().tolist(),
-        "current_platforms": current_platforms,
-        "previous_platforms": previous_platforms,
+        "current_content": list(current_data["content"]),
+        "previous_content": list(previous_data["content"]),
+        "current_clusters": list(current_data["clusters"]),
+        "previous_clusters": list(previous_data["clusters"]),
+        "current_platforms": dict(current_data["platforms"]),
+        "previous_platforms": dict(previous_data["platforms"]),
     }
 
-def generate_competitor_summary(brand_name, stats):
+def unique_posts(content, limit=15):
+    """First `limit` distinct post texts, in order (reshared posts repeat the same text)"""
+    return list(dict.fromkeys(content))[:limit]
+
+async def generate_competitor_summary(client, throttle, brand_name, stats):
     """Generate summary for a specific competitor brand"""
     if stats["current_posts"] == 0 and stats["previous_posts"] == 0:
         return f"{brand_name} had no social media posts in both this week and the previous week."
     
+    # Identical texts would only repeat prompt tokens
+    current_content = unique_posts(stats['current_content'])
+    previous_content = unique_posts(stats['previous_content'])
+    
     prompt = f"""
 You are analyzing social media performance for {brand_name} in Lithuania. Please provide a factual summary of their social media performance this week (most recent 7 days) compared to the previous week (7 days before that).
 
@@ -139,10 +189,10 @@ PERFORMANCE METRICS:
 - Total Engagement (sum of likes, comments, and shares) change: {stats['engagement_change']:+.1f}%
 
 THIS WEEK POST CONTENT (first 15 posts):
-{chr(10).join(stats['current_content'][:15])}
+{chr(10).join(current_content)}
 
 PREVIOUS WEEK POST CONTENT (first 15 posts):
-{chr(10).join(stats['previous_content'][:15])}
+{chr(10).join(previous_content)}
 
 THIS WEEK CLUSTERS:
 {', '.join(stats['current_clusters'])}
@@ -158,22 +208,62 @@ Please provide a concise 2-3 paragraph summary covering:
 Focus only on facts and actual data. Do not make assumptions about strategy, intentions, or potential outcomes. Include specific examples of actual posts posted.
 """
 
+    # Same prompt (brand, week stats and posts unchanged) -> reuse the earlier completion
+    model = "gpt-4o"
+    cache_path = summary_cache_path(prompt, model)
+    if cache_path is not None and cache_path.exists():
+        return cache_path.read_text(encoding="utf-8")
+    
     try:
-        response = client.chat.completions.create(
-            model="gpt-4o",
+        response = await create_completion(
+            client, throttle,
+            model=model,
             messages=[{"role": "user", "content": prompt}],
             temperature=0.3,
             max_tokens=500
         )
-        return response.choices[0].message.content.strip()
+        summary = response.choices[0].message.content.strip()
     except Exception as e:
         return f"Error generating summary: {str(e)}"
+    
+    if cache_path is not None:
+        try:
+            cache_path.parent.mkdir(parents=True, exist_ok=True)
+            cache_path.write_text(summary, encoding="utf-8")
+        except OSError as e:
+            print(f"Could not cache summary for {brand_name.encode('ascii', errors='ignore').decode('ascii')}: {e}")
+    return summary
 
-def generate_single_summary(brand_name, df_current_week, df_previous_week):
+async def generate_single_summary(client, throttle, brand_name, current_by_brand, previous_by_brand):
     """Generate summary for a single brand (for parallel processing)"""
     # Now treat Akropolis locations as individual brands
-    stats = get_brand_stats(df_current_week, df_previous_week, brand_name)
-    return generate_competitor_summary(brand_name, stats)
+    stats = get_brand_stats(current_by_brand, previous_by_brand, brand_name)
+    return await generate_competitor_summary(client, throttle, brand_name, stats)
+
+async def generate_brand_summaries(all_brands, current_by_brand, previous_by_brand):
+    """Generate all brand summaries concurrently, through the labeler's throttle (at most
+    config.GPT_MAX_WORKERS requests in flight, within the account's RPM/TPM limits)"""
+    client = get_async_openai_client()
+    throttle = RequestThrottle(config.GPT_MAX_WORKERS)
+    completed = 0
+    
+    async def summarize(brand):
+        nonlocal completed
+        safe_brand = brand.encode('ascii', errors='ignore').decode('ascii')
+        try:
+            summary = await generate_single_summary(client, throttle, brand, current_by_brand, previous_by_brand)
+            completed += 1
+            print(f"Completed {completed}/{len(all_brands)}: {safe_brand}")
+        except Exception as e:
+            completed += 1
+            print(f"Error generating summary for {safe_brand}: {e}")
+            summary = f"Error generating summary: {str(e)}"
+        return brand, summary
+    
+    try:
+        return dict(await asyncio.gather(*(summarize(brand) for brand in all_brands)))
+    finally:
+        await client.close()
 
 def generate_all_summaries():
     """Generate summaries for all brands and append to Excel file using parallel processing"""
@@ -183,6 +273,10 @@ def generate_all_summaries():
     # Prepare all brands for parallel processing (including individual Akropolis locations)
     all_brands = AKROPOLIS_LOCATIONS + ALL_COMPETITORS
     
+    # Aggregate both weeks per brand once instead of filtering them for every brand
+    current_by_brand = aggregate_brand_weeks(df_current_week)
+    previous_by_brand = aggregate_brand_weeks(df_previous_week)
+    
     print(f"Generating summaries for {len(all_brands)} brands using parallel processing...")
     
     summaries = {
@@ -190,32 +284,9 @@ def generate_all_summaries():
         "end_date": end_date
     }
     
-    # Use ThreadPoolExecutor for parallel processing
-    max_workers = min(config.GPT_MAX_WORKERS, len(all_brands))  # Use config setting or number of brands
-    print(f"Using {max_workers} parallel workers...")
-    
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        # Submit all tasks
-        future_to_brand = {
-            executor.submit(generate_single_summary, brand, df_current_week, df_previous_week): brand 
-            for brand in all_brands
-        }
-        
-        # Collect results as they complete
-        completed = 0
-        for future in as_completed(future_to_brand):
-            brand = future_to_brand[future]
-            try:
-                summary = future.result()
-                summaries[brand] = summary
-                completed += 1
-                safe_brand = brand.encode('ascii', errors='ignore').decode('ascii')
-                print(f"Completed {completed}/{len(all_brands)}: {safe_brand}")
-            except Exception as e:
-                safe_brand = brand.encode('ascii', errors='ignore').decode('ascii')
-                print(f"Error generating summary for {safe_brand}: {e}")
-                summaries[brand] = f"Error generating summary: {str(e)}"
-                completed += 1
+    # One event loop drives all requests concurrently
+    print(f"Using up to {config.GPT_MAX_WORKERS} concurrent requests...")
+    summaries.update(asyncio.run(generate_brand_summaries(all_brands, current_by_brand, previous_by_brand)))
     
     # Create DataFrame for new summaries
     df_new_summaries = pd.DataFrame([summaries])
@@ -224,10 +295,10 @@ def generate_all_summaries():
     Path("data").mkdir(exist_ok=True)
     
     # Load existing summaries or create new file
-    output_path = "data/summaries.xlsx"
-    if Path(output_path).exists():
+    output_path = Path(config.SUMMARIES_PARQUET)
+    if master_data_exists(output_path):
         try:
-            df_existing = pd.read_excel(output_path)
+            df_existing = load_master_data(output_path)
             # Append new summaries to existing data
             df_combined = pd.concat([df_existing, df_new_summaries], ignore_index=True)
             print(f"Appending new summaries to existing file with {len(df_existing)} existing rows")
@@ -238,12 +309,23 @@ def generate_all_summaries():
         df_combined = df_new_summaries
         print("Creating new summaries file")
     
-    # Save to Excel
-    df_combined.to_excel(output_path, index=False)
+    # Save (Parquet, plus the Excel export when enabled)
+    save_master_data(df_combined, output_path)
     
     print(f"All summaries completed and saved to {output_path}")
     return output_path
 
+def top_post_positions(engagement, n=3):
+    """Positions of the n highest values, highest first (ties in row order, like nlargest; NaN skipped)"""
+    positions = np.flatnonzero(~np.isnan(engagement))
+    values = engagement[positions]
+    if len(values) > n:
+        # O(N) partition to the n-th largest value, then sort only the rows at or above it
+        threshold = np.partition(values, len(values) - n)[len(values) - n]
+        keep = values >= threshold
+        positions, values = positions[keep], values[keep]
+    return positions[np.argsort(-values, kind="stable")[:n]]
+
 def get_engagement_insights(df_current_week, df_previous_week):
     """Generate insights about engagement patterns"""
     if df_current_week.empty and df_previous_week.empty:
@@ -253,9 +335,11 @@ def get_engagement_insights(df_current_week, df_previous_week):
     current_avg_engagement = df_current_week["total_engagement"].mean() if not df_current_week.empty else 0
     previous_avg_engagement = df_previous_week["total_engagement"].mean() if not df_previous_week.empty else 0
     
-    # Top performing posts
-    top_current = df_current_week.nlargest(3, "total_engagement") if not df_current_week.empty else pd.DataFrame()
-    top_previous = df_previous_week.nlargest(3, "total_engagement") if not df_previous_week.empty else pd.DataFrame()
+    # Top performing posts this week (raw arrays, no DataFrame rows)
+    engagement = df_current_week["total_engagement"].to_numpy()
+    top_current = top_post_positions(engagement.astype("float64"))
+    brands = df_current_week["brand"].to_numpy()
+    contents = df_current_week["content"].to_numpy()
     
     # Platform performance
     platform_current = df_current_week.groupby("platform")["total_engagement"].sum() if not df_current_week.empty else pd.Series()
@@ -272,9 +356,9 @@ Average Engagement:
 Top Performing Posts This Week:
 """
     
-    if not top_current.empty:
-        for i, (_, post) in enumerate(top_current.iterrows(), 1):
-            insights += f"{i}. {post['brand']}: {post['total_engagement']} engagement - {post['content'][:100]}...\n"
+    if len(top_current):
+        for i, pos in enumerate(top_current, 1):
+            insights += f"{i}. {brands[pos]}: {engagement[pos]} engagement - {contents[pos][:100]}...\n"
     else:
         insights += "No posts this week.\n"
     
@@ -9,12 +9,23 @@ from dateutil import tz
 import json
 import ast
 import re
+from datetime import date
+from functools import lru_cache
 from typing import List, Dict, Optional
 import config
 
 # Required columns for social media posts
 REQUIRED_COLUMNS = ["platform", "post_id", "created_date", "brand", "content", "source_url"]
 
+# Steps take shallow copies (df.copy(deep=False)) instead of full ones: with
+# pandas' copy-on-write, changing columns of the copy never touches the
+# caller's frame, and data is only duplicated if it is modified in place
+
+FACEBOOK_SLUG_RE = re.compile(r'facebook\.com/([^/?]+)')
+# Runs of the characters Python's \s matches (str.isspace()), spelled out so the
+# pattern also runs unchanged in pyarrow's regex engine, whose \s is ASCII-only
+WHITESPACE_RUN = '[\t-\r\x1c-\x20\x85\xa0\u1680\u2000-\u200a\u2028\u2029\u202f\u205f\u3000]+'
+
 def flatten_posts(posts: List[Dict]) -> pd.DataFrame:
     """
     Flatten nested social media post data into a DataFrame
@@ -29,7 +40,18 @@ def flatten_posts(posts: List[Dict]) -> pd.DataFrame:
         return pd.DataFrame()
     
     df = pd.DataFrame(posts)
-    return pd.json_normalize(df.to_dict(orient="records"), sep="/") if not df.empty else df
+    if df.empty:
+        return df
+    
+    # Only columns holding dicts need flattening (text columns are never nested);
+    # already-flat posts skip the round trip through per-row dicts entirely
+    nested = [col for col in df.select_dtypes(include="object").columns
+              if df[col].map(lambda value: isinstance(value, dict)).any()]
+    if not nested:
+        return df
+    
+    flattened = pd.json_normalize(df[nested].to_dict(orient="records"), sep="/").set_axis(df.index)
+    return pd.concat([df.drop(columns=nested), flattened], axis=1)
 
 def standardize_facebook_data(df: pd.DataFrame) -> pd.DataFrame:
     """
@@ -41,7 +63,7 @@ def standardize_facebook_data(df: pd.DataFrame) -> pd.DataFrame:
     Returns:
         Standardized DataFrame
     """
-    df = df.copy()
+    df = df.copy(deep=False)
     
     # Map Facebook-specific fields to standard columns
     field_mappings = {
@@ -57,18 +79,23 @@ def standardize_facebook_data(df: pd.DataFrame) -> pd.DataFrame:
         'source_url': ['source_url', 'url', 'snapshot/url']
     }
     
-    # Apply field mappings
+    # Apply field mappings: resolve every standard column to its first present
+    # candidate (or NA), then add them all in one assign; the candidate columns
+    # are kept (e.g. page_name), and under copy-on-write nothing is copied
+    resolved = {}
     for standard_col, candidates in field_mappings.items():
         if standard_col not in df.columns:
-            for candidate in candidates:
-                if candidate in df.columns:
-                    df[standard_col] = df[candidate]
-                    break
-            else:
-                df[standard_col] = pd.NA
+            candidate = next((col for col in candidates if col in df.columns), None)
+            resolved[standard_col] = df[candidate] if candidate is not None else pd.NA
     
-    return df
+    return df.assign(**resolved)
+
 
+def _to_wall_seconds(dates: pd.Series) -> pd.Series:
+    """Drop the timezone (keeping wall time) and sub-second part of parsed dates."""
+    if dates.dt.tz is not None:
+        dates = dates.dt.tz_localize(None)
+    return dates.dt.floor('s')
 
 def ensure_standard_columns(df: pd.DataFrame) -> pd.DataFrame:
     """
@@ -81,7 +108,7 @@ def ensure_standard_columns(df: pd.DataFrame) -> pd.DataFrame:
     Returns:
         DataFrame with standardized columns
     """
-    df = df.copy()
+    df = df.copy(deep=False)
     
     # Define essential columns to keep
     essential_columns = [
@@ -93,7 +120,7 @@ def ensure_standard_columns(df: pd.DataFrame) -> pd.DataFrame:
     
     # Keep only essential columns that exist in the dataframe
     existing_essential = [col for col in essential_columns if col in df.columns]
-    df = df[existing_essential].copy()
+    df = df[existing_essential]
     
     # Ensure platform column
     if 'platform' not in df.columns:
@@ -103,15 +130,16 @@ def ensure_standard_columns(df: pd.DataFrame) -> pd.DataFrame:
     if 'post_id' not in df.columns:
         df['post_id'] = pd.NA
     
-    # Ensure created_date column with proper formatting - always use date_posted as source
+    # Ensure created_date column as naive datetime64 (wall time, whole seconds) - always
+    # use date_posted as source; it stays a datetime through filtering and saving
     if 'date_posted' in df.columns:
         # Always use date_posted as the source for created_date
-        df['created_date'] = pd.to_datetime(df['date_posted'], errors='coerce').dt.strftime('%Y-%m-%d %H:%M:%S')
+        df['created_date'] = _to_wall_seconds(pd.to_datetime(df['date_posted'], errors='coerce'))
     elif 'created_date' in df.columns:
         # If date_posted doesn't exist, use existing created_date but convert properly
-        df['created_date'] = pd.to_datetime(df['created_date'], errors='coerce').dt.strftime('%Y-%m-%d %H:%M:%S')
+        df['created_date'] = _to_wall_seconds(pd.to_datetime(df['created_date'], errors='coerce'))
     else:
-        df['created_date'] = pd.NA
+        df['created_date'] = pd.NaT
     
     # Ensure brand column (use page_name if available)
     if 'brand' not in df.columns:
@@ -141,20 +169,31 @@ def ensure_standard_columns(df: pd.DataFrame) -> pd.DataFrame:
         if metric not in df.columns:
             df[metric] = 0
         else:
-            # Convert to numeric, filling NaN with 0
-            df[metric] = pd.to_numeric(df[metric], errors='coerce').fillna(0)
+            # Convert to numeric, filling NaN with 0; counts fit in int32, which halves
+            # the memory the engagement arithmetic streams through vs float64
+            df[metric] = pd.to_numeric(df[metric], errors='coerce').fillna(0).astype('int32')
     
     # Calculate total_engagement if not present
     if 'total_engagement' not in df.columns:
-        df['total_engagement'] = (df['likes'] * 1 + df['comments'] * 3 + df['shares'] * 5)
+        # One fused expression (numexpr-backed when installed), no temporaries
+        df['total_engagement'] = df.eval('likes + 3 * comments + 5 * shares')
     
-    # Convert all required columns to string type
-    for col in ['platform', 'post_id', 'created_date', 'brand', 'content', 'source_url']:
+    # Convert the required text columns to Arrow-backed strings (vectorized str/isin/hashing)
+    for col in ['platform', 'post_id', 'brand', 'content', 'source_url']:
         if col in df.columns:
-            df[col] = df[col].astype('string')
+            df[col] = df[col].astype('string[pyarrow]')
     
     return df
 
+def _brand_from_slug(username: str) -> str:
+    """Brand name for a facebook.com/<username> page slug."""
+    # Tracked pages map straight to their brand name
+    if username in config.SLUG_TO_BRAND:
+        return config.SLUG_TO_BRAND[username]
+    # Clean up the username
+    username = username.replace('.', ' ').replace('_', ' ').replace('-', ' ')
+    return username.title()
+
 def extract_brand_from_url(url: str) -> str:
     """
     Extract brand name from social media URL
@@ -171,16 +210,28 @@ def extract_brand_from_url(url: str) -> str:
     # Facebook URL patterns
     if "facebook.com" in url:
         # Extract from facebook.com/username
-        match = re.search(r'facebook\.com/([^/?]+)', url)
+        match = FACEBOOK_SLUG_RE.search(url)
         if match:
-            username = match.group(1)
-            # Clean up the username
-            username = username.replace('.', ' ').replace('_', ' ').replace('-', ' ')
-            return username.title()
+            return _brand_from_slug(match.group(1))
     
     
     return "Unknown"
 
+def extract_brands_from_urls(urls: pd.Series) -> pd.Series:
+    """
+    Vectorized extract_brand_from_url for a whole column: the page slugs are
+    extracted in one pass and each distinct slug is converted once.
+    
+    Args:
+        urls: Series of social media page URLs
+    
+    Returns:
+        Series of brand names ("Unknown" where none can be extracted)
+    """
+    slugs = urls.str.extract(FACEBOOK_SLUG_RE.pattern, expand=False)
+    brands = {slug: _brand_from_slug(slug) for slug in slugs.dropna().unique()}
+    return slugs.map(brands).fillna("Unknown")
+
 def normalize_brand_names(df: pd.DataFrame) -> pd.DataFrame:
     """
     Normalize brand names to match the expected format
@@ -192,7 +243,7 @@ def normalize_brand_names(df: pd.DataFrame) -> pd.DataFrame:
     Returns:
         DataFrame with normalized brand names
     """
-    df = df.copy()
+    df = df.copy(deep=False)
     
     # Use page_name as the exact brand name (no case changes or mappings)
     if 'page_name' in df.columns:
@@ -203,7 +254,7 @@ def normalize_brand_names(df: pd.DataFrame) -> pd.DataFrame:
     else:
         # If neither exists, try to extract from source_url
         if 'source_url' in df.columns:
-            df['brand'] = df['source_url'].apply(extract_brand_from_url)
+            df['brand'] = extract_brands_from_urls(df['source_url'])
         else:
             df['brand'] = 'Unknown'
     
@@ -219,27 +270,19 @@ def clean_content(df: pd.DataFrame) -> pd.DataFrame:
     Returns:
         DataFrame with cleaned content
     """
-    df = df.copy()
+    df = df.copy(deep=False)
     
     if 'content' not in df.columns:
         return df
     
-    def clean_text(text):
-        if pd.isna(text) or not isinstance(text, str):
-            return ""
-        
-        # Remove extra whitespace
-        text = re.sub(r'\s+', ' ', text)
-        
-        # Remove URLs (optional - might want to keep them for analysis)
-        # text = re.sub(r'http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\\(\\),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+', '', text)
-        
-        # Remove excessive line breaks
-        text = re.sub(r'\n+', '\n', text)
-        
-        return text.strip()
+    # Non-text values (NaN, numbers) become empty strings
+    content = df['content']
+    if not pd.api.types.is_string_dtype(content):
+        content = content.where(content.map(lambda value: isinstance(value, str)))
+    content = content.astype('str').fillna('')
     
-    df['content'] = df['content'].apply(clean_text)
+    # Collapse whitespace runs (line breaks included) to single spaces, then trim
+    df['content'] = content.str.replace(WHITESPACE_RUN, ' ', regex=True).str.strip(' ')
     
     return df
 
@@ -253,7 +296,7 @@ def calculate_engagement_metrics(df: pd.DataFrame) -> pd.DataFrame:
     Returns:
         DataFrame with calculated engagement metrics
     """
-    df = df.copy()
+    df = df.copy(deep=False)
     
     # Calculate total engagement (likes + comments + shares)
     if all(col in df.columns for col in ['likes', 'comments', 'shares']):
@@ -266,6 +309,11 @@ def calculate_engagement_metrics(df: pd.DataFrame) -> pd.DataFrame:
     
     return df
 
+@lru_cache(maxsize=8)
+def _recent_cutoff(today: date, days_back: int) -> pd.Timestamp:
+    """Start of the recent-posts window (memoized per day, so it rolls over at midnight)."""
+    return pd.Timestamp(today) - pd.Timedelta(days=days_back)
+
 def filter_recent_posts(df: pd.DataFrame, tz_name: str = None, days_back: int = None) -> pd.DataFrame:
     """
     Filter posts to only include recent ones
@@ -287,19 +335,22 @@ def filter_recent_posts(df: pd.DataFrame, tz_name: str = None, days_back: int =
         print("⚠️ No created_date column found, skipping date filtering")
         return df
     
-    df = df.copy()
+    df = df.copy(deep=False)
     
-    # Convert created_date to datetime
-    df['created_date'] = pd.to_datetime(df['created_date'], errors='coerce')
+    # Convert created_date to datetime (already one after ensure_standard_columns)
+    if not pd.api.types.is_datetime64_any_dtype(df['created_date']):
+        df['created_date'] = pd.to_datetime(df['created_date'], errors='coerce')
     
     # Filter for recent posts - use timezone-naive comparison
-    now = pd.Timestamp.now().normalize()
-    cutoff_date = now - pd.Timedelta(days=days_back)
+    cutoff_date = _recent_cutoff(date.today(), days_back)
     
-    # Convert both to timezone-naive for comparison
-    df['created_date'] = df['created_date'].dt.tz_localize(None) if df['created_date'].dt.tz is not None else df['created_date']
+    # Convert both to timezone-naive for comparison (dates from ensure_standard_columns
+    # are already naive, so this only runs for frames passed in directly)
+    if df['created_date'].dt.tz is not None:
+        df['created_date'] = df['created_date'].dt.tz_localize(None)
     
-    recent_posts = df[df['created_date'] >= cutoff_date].copy()
+    # Plain NumPy datetime64 compare (NaT compares False, so undated posts drop out)
+    recent_posts = df[df['created_date'].to_numpy() >= cutoff_date.to_datetime64()]
     
     print(f"📅 Filtered to {len(recent_posts)} posts from last {days_back} days (from {len(df)} total)")
     
@@ -327,7 +378,7 @@ def process_social_media_data(posts: List[Dict]) -> pd.DataFrame:
     
     # Step 2: Standardize platform-specific data
     if 'platform' in df.columns:
-        facebook_posts = df[df['platform'] == 'facebook'].copy()
+        facebook_posts = df[df['platform'] == 'facebook']
         
         if not facebook_posts.empty:
             facebook_posts = standardize_facebook_data(facebook_posts)
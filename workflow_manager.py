@@ -6,11 +6,35 @@ Handles appending new scraped data to master files and automatic labeling
 
 import pandas as pd
 import os
+import functools
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 from datetime import datetime
 import config
-from gpt_labeler import label_posts_with_gpt
-from storage import load_excel, save_excel, deduplicate_posts, merge_with_existing_data
+from gpt_labeler import label_posts_with_gpt, LABEL_COLUMNS
+from storage import load_table, load_master_data, save_master_data, master_data_exists, deduplicate_posts, ENGAGEMENT_COLUMNS
+
+def load_new_data_files(paths):
+    """
+    Load one or more scraped data files into a single DataFrame
+    
+    Several files are parsed in parallel worker processes (Excel parsing is
+    CPU-bound), so a backlog of scrape batches is merged into the master once.
+    
+    Args:
+        paths (list): Paths to the scraped data files
+    
+    Returns:
+        pd.DataFrame: The files' rows, concatenated in the given order
+    """
+    # The cache flag is passed explicitly: worker processes may re-import config
+    # (spawn start method), which would drop a --no-cache set in this process
+    load = functools.partial(load_table, use_cache=config.USE_EXCEL_CACHE)
+    if len(paths) == 1:
+        return load(paths[0])
+    with ProcessPoolExecutor(max_workers=min(len(paths), os.cpu_count() or 1)) as pool:
+        frames = list(pool.map(load, paths))
+    return pd.concat(frames, ignore_index=True, sort=False)
 
 def append_new_data_to_master(platform, new_data_file):
     """
@@ -18,74 +42,81 @@ def append_new_data_to_master(platform, new_data_file):
     
     Args:
         platform (str): 'facebook'
-        new_data_file (str): Path to the new scraped data file
+        new_data_file (str or list): Path(s) to the new scraped data file(s)
     """
-    print(f"🔄 Processing new {platform} data from {new_data_file}")
+    new_data_files = [new_data_file] if isinstance(new_data_file, (str, Path)) else list(new_data_file)
+    sources = ", ".join(str(path) for path in new_data_files)
+    print(f"🔄 Processing new {platform} data from {sources}")
     
     # Load new data
-    if not os.path.exists(new_data_file):
-        print(f"❌ Error: File {new_data_file} not found")
-        return False
+    for path in new_data_files:
+        if not os.path.exists(path):
+            print(f"❌ Error: File {path} not found")
+            return False
     
-    new_df = pd.read_excel(new_data_file)
-    print(f"📊 Loaded {len(new_df)} new posts from {new_data_file}")
+    new_df = load_new_data_files(new_data_files)
+    print(f"📊 Loaded {len(new_df)} new posts from {sources}")
     
     # Determine master file path
     if platform.lower() == 'facebook':
-        master_file = config.FACEBOOK_MASTER_XLSX
+        master_file = config.FACEBOOK_MASTER_PARQUET
     else:
         print(f"❌ Error: Invalid platform '{platform}'. Must be 'facebook'")
         return False
     
-    # Load existing master data
-    if os.path.exists(master_file):
-        existing_df = load_excel(master_file)
-        print(f"📁 Loaded {len(existing_df)} existing posts from master file")
-    else:
-        existing_df = pd.DataFrame()
-        print("📁 No existing master file found, creating new one")
-    
     # Ensure new data has platform column
     new_df['platform'] = platform.lower()
     
-    # Merge with existing data (deduplication happens in merge function)
-    merged_df = merge_with_existing_data(existing_df, new_df)
-    print(f"🔗 Merged data: {len(merged_df)} total posts")
+    # Finding the new posts only needs the master's post ids (a column-pruned
+    # Parquet read); the full master file is loaded only if there are new posts
+    if master_data_exists(master_file):
+        existing_ids = load_master_data(master_file, columns=['post_id'])['post_id']
+        print(f"📁 Master file has {len(existing_ids)} existing posts")
+    else:
+        existing_ids = pd.Series(dtype='string[pyarrow]')
+        print("📁 No existing master file found, creating new one")
     
     # Identify new posts that need labeling
-    if len(existing_df) > 0:
-        existing_post_ids = set(existing_df['post_id'].astype(str))
-        new_posts_mask = ~merged_df['post_id'].astype(str).isin(existing_post_ids)
-        new_posts_df = merged_df[new_posts_mask].copy()
-    else:
-        new_posts_df = merged_df.copy()
+    new_df = deduplicate_posts(new_df)
+    # Compare as strings (the master may store ids as ints); the Index's
+    # hashtable is built once, no Python set
+    existing_post_ids = pd.Index(existing_ids.astype('string[pyarrow]'))
+    new_posts_df = new_df[~new_df['post_id'].astype('string[pyarrow]').isin(existing_post_ids)]
     
     print(f"🏷️  Found {len(new_posts_df)} new posts that need GPT labeling")
     
+    if new_posts_df.empty:
+        print("ℹ️  No new posts to add, master file left unchanged")
+        return True
+    
     # Apply GPT labeling to new posts
-    if len(new_posts_df) > 0:
-        print("🤖 Starting GPT labeling for new posts...")
-        try:
-            labeled_df = label_posts_with_gpt(new_posts_df)
-            print(f"✅ Successfully labeled {len(labeled_df)} new posts")
-            
-            # Update the merged dataframe with labeled data
-            merged_df.loc[new_posts_mask, ['post_summary', 'cluster_1', 'cluster_2', 'cluster_3']] = labeled_df[['post_summary', 'cluster_1', 'cluster_2', 'cluster_3']]
-            
-        except Exception as e:
-            print(f"⚠️  Warning: GPT labeling failed: {e}")
-            print("💾 Saving data without labels (can be labeled later)")
-    else:
-        print("ℹ️  No new posts to label")
+    print("🤖 Starting GPT labeling for new posts...")
+    try:
+        labeled_df = label_posts_with_gpt(new_posts_df)
+        print(f"✅ Successfully labeled {len(labeled_df)} new posts")
+        
+        # The labeler drops posts without text and compacts the content, so only its
+        # label columns are joined back onto the scraped posts (by post_id); posts
+        # it did not label are still appended, just without labels
+        label_cols = [col for col in LABEL_COLUMNS if col in labeled_df.columns]
+        labels = labeled_df.drop_duplicates(subset='post_id').set_index('post_id')[label_cols]
+        new_posts_df = new_posts_df.drop(columns=label_cols, errors='ignore').join(labels, on='post_id')
+    except Exception as e:
+        print(f"⚠️  Warning: GPT labeling failed: {e}")
+        print("💾 Saving data without labels (can be labeled later)")
+    
+    # Append the new posts to the full master data
+    existing_df = load_master_data(master_file) if master_data_exists(master_file) else pd.DataFrame()
+    merged_df = deduplicate_posts(pd.concat([existing_df, new_posts_df], ignore_index=True, sort=False))
+    print(f"🔗 Merged data: {len(merged_df)} total posts")
     
     # Calculate engagement metrics
-    merged_df["likes"] = pd.to_numeric(merged_df["likes"], errors="coerce").fillna(0)
-    merged_df["comments"] = pd.to_numeric(merged_df["comments"], errors="coerce").fillna(0)
-    merged_df["shares"] = pd.to_numeric(merged_df["shares"], errors="coerce").fillna(0)
-    merged_df["total_engagement"] = (merged_df["likes"] * 1 + merged_df["comments"] * 3 + merged_df["shares"] * 5)
+    merged_df = merged_df.assign(**{col: pd.to_numeric(merged_df[col], errors="coerce").fillna(0).astype("int32")
+                                    for col in ENGAGEMENT_COLUMNS})
+    merged_df["total_engagement"] = merged_df.eval("likes + 3 * comments + 5 * shares")
     
     # Save updated master file
-    save_excel(merged_df, master_file)
+    save_master_data(merged_df, master_file)
     print(f"💾 Saved updated master file: {master_file}")
     print(f"📈 Total posts in master file: {len(merged_df)}")
     
@@ -96,7 +127,7 @@ def process_new_scraped_files(facebook_file=None):
     Process new scraped files and append to master files
     
     Args:
-        facebook_file (str, optional): Path to new Facebook data file
+        facebook_file (str or list, optional): Path(s) to new Facebook data file(s)
     """
     print("🚀 Starting workflow manager for new scraped data")
     print(f"📅 Analysis period: {config.ANALYSIS_START_DATE} to {config.ANALYSIS_END_DATE}")
@@ -116,23 +147,26 @@ def process_new_scraped_files(facebook_file=None):
 def regenerate_summaries_after_update():
     """Regenerate summaries after updating master files"""
     print("📝 Regenerating AI summaries with updated data...")
+    if not config.ENABLE_WEEKLY_SUMMARIES:
+        print("⏭️ Weekly summaries disabled in config")
+        return
+    # Run in this process (no second interpreter re-importing pandas and openai);
+    # this also makes --no-cache apply to the summary cache
     try:
-        import subprocess
-        result = subprocess.run(['python', 'summary_generator.py'], capture_output=True, text=True)
-        if result.returncode == 0:
-            print("✅ Summaries regenerated successfully!")
-        else:
-            print(f"❌ Error regenerating summaries: {result.stderr}")
+        from summary_generator import generate_all_summaries
+        summary_path = generate_all_summaries()
+        print(f"✅ Summaries regenerated successfully! Saved to {summary_path}")
     except Exception as e:
-        print(f"❌ Error running summary generator: {e}")
+        print(f"❌ Error regenerating summaries: {e}")
 
 if __name__ == "__main__":
     import sys
     
     if len(sys.argv) < 2:
         print("Usage:")
-        print("  python workflow_manager.py --facebook path/to/facebook_data.xlsx")
+        print("  python workflow_manager.py --facebook path/to/facebook_data.xlsx [more_batches.xlsx ...]")
         print("  python workflow_manager.py --summaries  # Regenerate summaries only")
+        print("  add --no-cache to re-read Excel inputs and regenerate summaries instead of using the caches")
         sys.exit(1)
     
     facebook_file = None
@@ -141,11 +175,19 @@ if __name__ == "__main__":
     i = 1
     while i < len(sys.argv):
         if sys.argv[i] == '--facebook' and i + 1 < len(sys.argv):
-            facebook_file = sys.argv[i + 1]
-            i += 2
+            # Every following argument up to the next flag is a batch file
+            i += 1
+            facebook_file = []
+            while i < len(sys.argv) and not sys.argv[i].startswith('--'):
+                facebook_file.append(sys.argv[i])
+                i += 1
         elif sys.argv[i] == '--summaries':
             regenerate_summaries = True
             i += 1
+        elif sys.argv[i] == '--no-cache':
+            config.USE_EXCEL_CACHE = False
+            config.USE_SUMMARY_CACHE = False
+            i += 1
         else:
             i += 1
     